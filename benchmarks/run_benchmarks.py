@@ -0,0 +1,182 @@
+"""
+Pipeline benchmark over synthetic inputs of growing size.
+
+For every (countries, scenarios) point the harness generates a synthetic input tree, runs
+`wash-futures build` on it in a separate process and collects the per stage timings from the
+`run_report.json` written by the stage profiler. The peak memory comes from a second build with
+`--profile-memory` (tracemalloc slows the stages down several times, so it is kept out of the timings). The curves are saved to `benchmarks/results/`
+together with the log-log scaling exponent of every stage between consecutive points, so that
+quadratic (or worse) stages stand out before they reach a full size run.
+
+Example:
+
+    python run_benchmarks.py --countries 5 10 22 --scenarios 36
+    python run_benchmarks.py --countries 22 --scenarios 36 72 --timeout 1800 --no-memory
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+from synthetic import generate
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+# A stage whose time grows faster than size ** QUADRATIC_THRESHOLD is reported
+QUADRATIC_THRESHOLD = 1.5
+
+
+def build_command(workdir, profile_memory=False):
+    return [
+        sys.executable, '-m', 'wash_futures', 'build',
+        '--input-dir', os.path.join(workdir, 'input_data'),
+        '--output-dir', os.path.join(workdir, 'output_data'),
+        '--tests-dir', os.path.join(workdir, 'tests'),
+        # Every point times a cold build, without the stage and country caches of a previous run
+        '--cache-dir', '',
+    ] + (['--profile-memory'] if profile_memory else [])
+
+
+def run_build(workdir, timeout, profile_memory=False):
+    """The run report of a build of the work directory, None when it timed out."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')])))
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(
+            build_command(workdir, profile_memory), env=env, capture_output=True, text=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        print(f'  timed out after {timeout}s')
+        return None
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        print(process.stderr[-2000:])
+        raise RuntimeError(f'Pipeline failed for {workdir}')
+    with open(os.path.join(workdir, 'output_data', 'run_report.json')) as file:
+        report = json.load(file)
+    report['wall_seconds'] = round(elapsed, 4)
+    return report
+
+
+def run_point(n_countries, n_scenarios, timeout, seed=0, keep=False, memory=True):
+    """Sizes of the point, its timing run report and its memory run report (None when skipped or timed out)."""
+    workdir = tempfile.mkdtemp(prefix=f'wash-bench-{n_countries}x{n_scenarios}-')
+    try:
+        sizes = generate(os.path.join(workdir, 'input_data'), n_countries, n_scenarios, seed=seed)
+        report = run_build(workdir, timeout)
+        memory_report = run_build(workdir, timeout, profile_memory=True) if report is not None and memory else None
+        return sizes, report, memory_report
+    finally:
+        if keep:
+            print(f'  kept {workdir}')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def stage_group(name):
+    # Per file stages are summed so the curves do not depend on the file names
+    return '3.B.1 IFS files' if name.startswith('3.B.1 ') and name.endswith('.csv') else name
+
+
+def stage_frame(report):
+    stages = pd.DataFrame(report['stages'])
+    stages = stages[stages['depth'] <= 1].copy()
+    parent = None
+    names = []
+    for record in stages.to_dict('records'):
+        if record['depth'] == 0:
+            parent = stage_group(record['stage'])
+            names.append(parent)
+        else:
+            names.append(f"{parent} / {record['stage']}")
+    stages['stage'] = names
+    return stages
+
+
+def collect_stages(sizes, report, memory_report=None):
+    """Seconds and rows of the stages from the timing run, peak memory from the memory run."""
+    result = stage_frame(report).groupby('stage', sort=False).agg(
+        seconds=('seconds', 'sum'),
+        rows=('rows', 'sum'),
+    ).reset_index()
+    if memory_report is not None:
+        peaks = stage_frame(memory_report).groupby('stage', sort=False)['peak_memory_mb'].max()
+        result.insert(2, 'peak_memory_mb', result['stage'].map(peaks))
+    else:
+        result.insert(2, 'peak_memory_mb', np.nan)
+    for key, value in sizes.items():
+        result[key] = value
+    return result
+
+
+def scaling_exponents(results):
+    """Slope of log(seconds) against log(ifs_cells) between consecutive benchmark points."""
+    rows = []
+    for stage, group in results.groupby('stage', sort=False):
+        group = group.sort_values('ifs_cells')
+        cells = group['ifs_cells'].to_numpy(dtype=float)
+        seconds = group['seconds'].to_numpy(dtype=float)
+        for i in range(1, len(group)):
+            if cells[i] == cells[i - 1] or min(seconds[i], seconds[i - 1]) < 0.01:
+                continue
+            slope = np.log(seconds[i] / seconds[i - 1]) / np.log(cells[i] / cells[i - 1])
+            rows.append({
+                'stage': stage,
+                'from_cells': int(cells[i - 1]),
+                'to_cells': int(cells[i]),
+                'exponent': round(slope, 2),
+                'superlinear': slope > QUADRATIC_THRESHOLD,
+            })
+    return pd.DataFrame(rows, columns=['stage', 'from_cells', 'to_cells', 'exponent', 'superlinear'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic inputs.')
+    parser.add_argument('--countries', type=int, nargs='+', default=[5, 10, 22])
+    parser.add_argument('--scenarios', type=int, nargs='+', default=[36])
+    parser.add_argument('--timeout', type=int, default=3600, help='Seconds before a point is abandoned')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help='Keep the generated work directories')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip the peak memory build of every point')
+    args = parser.parse_args()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    frames = []
+    for n_scenarios in args.scenarios:
+        for n_countries in args.countries:
+            print(f'[BENCH] {n_countries} countries x {n_scenarios} scenarios')
+            sizes, report, memory_report = run_point(
+                n_countries, n_scenarios, args.timeout, args.seed, args.keep, args.memory
+            )
+            if report is None:
+                break  # larger points would time out as well
+            peak = f", peak {memory_report['peak_memory_mb']} MB" if memory_report is not None else ''
+            print(f"  {report['wall_seconds']}s{peak}")
+            frames.append(collect_stages(sizes, report, memory_report))
+    if not frames:
+        return
+    results = pd.concat(frames, ignore_index=True)
+    exponents = scaling_exponents(results)
+    name = time.strftime('benchmark_%Y%m%d_%H%M%S')
+    results.to_csv(os.path.join(RESULTS_DIR, f'{name}.csv'), index=False)
+    exponents.to_csv(os.path.join(RESULTS_DIR, f'{name}_scaling.csv'), index=False)
+    totals = results.pivot_table(index='stage', columns='ifs_cells', values='seconds', sort=False)
+    print(totals.round(3).to_string())
+    flagged = exponents[exponents['superlinear']]
+    if not flagged.empty:
+        print(f'\nStages growing faster than size^{QUADRATIC_THRESHOLD}:')
+        print(flagged.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Synthetic IFs and JMP input generators.
+
+The files follow the layout the pipeline reads:
+
+- IFs exports: `pd.read_csv(header=[1,2,4,5])`, i.e. row 0 holds the indicator title, row 1 the
+  country, row 2 the 2nd dimension, row 3 is skipped, row 4 the unit and row 5 the scenario
+  (`Base` or `<value_name>_<jmp_category>_<commitment>`). The first column holds the year.
+- JMP: the 9 column `jmp.csv` export (latin-1) with `-99` as the missing value sentinel.
+
+Example:
+
+    python synthetic.py --countries 40 --scenarios 60 --output /tmp/wash-synthetic
+"""
+
+import os
+import csv
+import argparse
+import numpy as np
+
+
+# IFs country names as they appear in the exports (mapped by `country_mapping` in main.py)
+IFS_COUNTRIES = [
+    'All countries WHHS Tool1', 'Congo Dem. Republic of the', 'Ethiopia', 'Ghana', 'Guatemala', 'Haiti', 'India',
+    'Indonesia', 'Kenya', 'Liberia', 'Madagascar', 'Malawi', 'Mali', 'Mozambique', 'Nepal', 'Nigeria', 'Philippines',
+    'Rwanda', 'Senegal', 'Sudan South', 'Tanzania', 'Uganda', 'Zambia',
+]
+
+# The same countries as they appear in the JMP export
+JMP_COUNTRY_NAMES = {
+    'All countries WHHS Tool1': None,
+    'Congo Dem. Republic of the': 'Democratic Republic of the Congo',
+    'Sudan South': 'South Sudan',
+    'Tanzania': 'United Republic of Tanzania',
+}
+
+# (file name, title, unit, 2nd dimensions)
+IFS_INDICATORS = [
+    ('01. Deaths by Category of Cause - Millions (2nd Dimensions = Diarrhea).csv',
+     'Deaths by Category of Cause', 'Mil People', ['Diarrhea']),
+    ('06. Poverty Headcount less than $2.15 per Day, Log Normal - Millions.csv',
+     'Poverty Headcount less than $2.15 per Day, Log Normal', 'Mil People', ['']),
+    ('08. State Failure Instability Event - IFs Index.csv',
+     'State Failure Instability Event', 'Index', ['']),
+    ('11. Governance Effectiveness - WB index.csv',
+     'Governance Effectiveness', 'Index 0-5', ['']),
+    ('13. Sanitation Services, Access, percent of population (2nd Dimensions = Basic + Safely Managed).csv',
+     'Sanitation Services, Access, percent of population', 'Percent', ['Basic', 'SafelyManaged']),
+    ('14. Sanitation Services, Access, Number of people, million (2nd Dimensions = Basic + Safely Managed).csv',
+     'Sanitation Services, Access, Number of people', 'Million', ['Basic', 'SafelyManaged']),
+    ('15. Sanitation Services, Expenditure, Capital, Billion $ (2nd Dimensions = Basic + Safely Managed).csv',
+     'Sanitation Services, Expenditure, Capital', 'Billion 2017 $', ['Basic', 'SafelyManaged']),
+    ('16. Sanitation Services, Expenditure, Maintenance, Billion $ (2nd Dimensions = Basic + Safely Managed).csv',
+     'Sanitation Services, Expenditure, Maintenance', 'Billion 2017 $', ['Basic', 'SafelyManaged']),
+    ('17. Water Services, Access, percent of population (2nd Dimensions = Basic + Safely Managed).csv',
+     'Water Services, Access, percent of population', 'Percent', ['Basic', 'SafelyManaged']),
+    ('18. Water Services, Access, Number of people, million (2nd Dimensions = Basic + Safely Managed).csv',
+     'Water Services, Access, Number of people', 'Million', ['Basic', 'SafelyManaged']),
+    ('19. Water Services, Expenditure, Capital, Billion $ (2nd Dimensions = Basic + Safely Managed).csv',
+     'Water Services, Expenditure, Capital', 'Billion 2017 $', ['Basic', 'SafelyManaged']),
+    ('20. Water Services, Expenditure, Maintenance, Billion $ (2nd Dimensions = Basic + Safely Managed).csv',
+     'Water Services, Expenditure, Maintenance', 'Billion 2017 $', ['Basic', 'SafelyManaged']),
+    ('23. GDP (PPP) - Billion dollars.csv',
+     'GDP (PPP)', 'Trillion $', ['']),
+    ('24. Stunted children, History and Forecast - Million.csv',
+     'Stunted children, History and Forecast', 'Million', ['']),
+    ('26. Malnourished Children, Headcount - Millions.csv',
+     'Malnourished Children, Headcount', 'Mil People', ['']),
+]
+
+# First year in which the scenarios diverge from Base
+FIRST_SCENARIO_YEAR = 2020
+
+JMP_COLUMNS = [
+    'COUNTRY, AREA OR TERRITORY',
+    'Year',
+    'Type',
+    'TOTAL - At least basic',
+    'TOTAL - Annual rate of change in \nat least basic',
+    'TOTAL - Safely managed',
+    'TOTAL - Annual rate of change in safely managed',
+    'TOTAL - Annual rate of change SM, manual calculation',
+    'TOTAL - Annual rate of change ALB, manual calculation',
+]
+
+
+def country_names(n):
+    """Returns `n` IFs country names, the real HPC list first then numbered synthetic countries."""
+    names = IFS_COUNTRIES[:n]
+    names += [f'Synthetic Country {i:03d}' for i in range(len(names) + 1, n + 1)]
+    return names
+
+
+def scenario_names(n):
+    """
+    Returns `n` scenario labels. The first 36 are the real scenario files (12 full access and
+    24 multiplier scenarios), larger sets add more integer multipliers (`<value_name>_<BS|SM>_<k>x`).
+    """
+    names = []
+    for value_name in ['FS', 'FW', 'FWS']:
+        for category in ['ALB', 'SM']:
+            for year in ['2030', '2050']:
+                names.append(f'{value_name}_{category}_{year}')
+    multipliers = ['0_5x', '2x', '4x', '6x']
+    extra = [k for k in range(3, 1000) if k not in (4, 6)]
+    while len(names) + len(multipliers) * 6 < n:
+        multipliers.append(f'{extra.pop(0)}x')
+    for value_name in ['SI', 'WI', 'WSI']:
+        for category in ['BS', 'SM']:
+            for multiplier in multipliers:
+                names.append(f'{value_name}_{category}_{multiplier}')
+    return names[:n]
+
+
+def scenario_factor(scenario, years):
+    """
+    Relative speed of progress of a scenario compared to Base, per year. As in the IFs exports,
+    every scenario follows the Base history until `FIRST_SCENARIO_YEAR`.
+    """
+    if scenario == 'Base':
+        return np.ones(len(years))
+    commitment = scenario.split('_', 2)[2].replace('0_5x', '0.5x')
+    if commitment.endswith('x'):
+        factor = np.full(len(years), float(commitment[:-1]))
+    else:
+        # Full access scenarios accelerate until their target year
+        factor = np.where(years <= int(commitment), 4.0, 1.0)
+    return np.where(years < FIRST_SCENARIO_YEAR, 1.0, factor)
+
+
+def ifs_values(years, scenario, unit, dimension, start, speed):
+    progress = np.cumsum(scenario_factor(scenario, years)) * speed
+    if unit == 'Percent':
+        return np.clip(start + progress, 0, 100 if dimension != 'Basic' else 70)
+    return np.round(start * (1 + progress / 100), 4)
+
+
+def ifs_start(rng, unit, dimension):
+    if unit == 'Percent':
+        return rng.uniform(10, 60) if dimension != 'SafelyManaged' else rng.uniform(5, 30)
+    return rng.uniform(0.01, 500)
+
+
+def write_ifs_file(path, title, unit, dimensions, countries, scenarios, years, rng):
+    scenario_labels = ['Base'] + scenarios
+    columns, values = [], []
+    for c in countries:
+        for d in dimensions:
+            # The scenarios of a country and dimension share the Base start and speed
+            start, speed = ifs_start(rng, unit, d), rng.uniform(0.2, 1.5)
+            for s in scenario_labels:
+                columns.append((c, d, s))
+                values.append(ifs_values(years, s, unit, d, start, speed))
+    values = np.column_stack(values)
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([title] + [''] * len(columns))
+        writer.writerow([''] + [c for c, _, _ in columns])
+        writer.writerow([''] + [d for _, d, _ in columns])
+        writer.writerow([''] + ['Total'] * len(columns))
+        writer.writerow([''] + [unit] * len(columns))
+        # IFs exports often carry stray semicolons, `cleanup_semicolon` removes them
+        writer.writerow([''] + [f'{s};' for _, _, s in columns])
+        for year, row in zip(years, values):
+            writer.writerow([int(year)] + [f'{v:.4f}' for v in row])
+    return len(columns) * len(years)
+
+
+def write_jmp_file(path, countries, years, rng, extra_countries=20):
+    names = [JMP_COUNTRY_NAMES.get(c, c) for c in countries]
+    names = [n for n in names if n] + [f'JMP Only Country {i:03d}' for i in range(1, extra_countries + 1)]
+    rows = 0
+    with open(path, 'w', newline='', encoding='latin-1') as file:
+        writer = csv.writer(file)
+        writer.writerow(JMP_COLUMNS)
+        for name in sorted(names):
+            for jmp_type in ['Water', 'Sanitation']:
+                alb = np.clip(rng.uniform(10, 70) + np.cumsum(rng.uniform(0, 2, len(years))), 0, 100)
+                sm = alb * rng.uniform(0.2, 0.8)
+                values = np.column_stack([
+                    np.round(alb, 1), np.round(rng.uniform(0, 3, len(years)), 1),
+                    np.round(sm, 1), np.round(rng.uniform(0, 3, len(years)), 1),
+                    np.round(rng.uniform(0, 3, len(years)), 1), np.round(rng.uniform(0, 3, len(years)), 1),
+                ])
+                # Missing values are exported as -99
+                values[rng.random(values.shape) < 0.02] = -99
+                for year, row in zip(years, values):
+                    writer.writerow([name, int(year), jmp_type] + list(row))
+                    rows += 1
+    return rows
+
+
+def generate(output_dir, n_countries=23, n_scenarios=36, first_year=2015, last_year=2050, jmp_extra_countries=20, seed=0):
+    """
+    Writes a full synthetic input tree (`<output_dir>/IFs/*.csv` and `<output_dir>/JMP/jmp.csv`)
+    and returns a summary of the generated sizes.
+    """
+    rng = np.random.default_rng(seed)
+    countries = country_names(n_countries)
+    scenarios = scenario_names(n_scenarios)
+    years = np.arange(first_year, last_year + 1)
+    os.makedirs(os.path.join(output_dir, 'IFs'), exist_ok=True)
+    os.makedirs(os.path.join(output_dir, 'JMP'), exist_ok=True)
+    ifs_cells = 0
+    for filename, title, unit, dimensions in IFS_INDICATORS:
+        path = os.path.join(output_dir, 'IFs', filename)
+        ifs_cells += write_ifs_file(path, title, unit, dimensions, countries, scenarios, years, rng)
+    jmp_rows = write_jmp_file(
+        os.path.join(output_dir, 'JMP', 'jmp.csv'),
+        countries, np.arange(2000, 2023), rng, extra_countries=jmp_extra_countries
+    )
+    return {
+        'countries': len(countries),
+        'scenarios': len(scenarios),
+        'years': len(years),
+        'ifs_files': len(IFS_INDICATORS),
+        'ifs_cells': ifs_cells,
+        'jmp_rows': jmp_rows,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic IFs and JMP input files.')
+    parser.add_argument('--output', required=True, help='Directory that will hold the IFs/ and JMP/ folders')
+    parser.add_argument('--countries', type=int, default=23)
+    parser.add_argument('--scenarios', type=int, default=36)
+    parser.add_argument('--first-year', type=int, default=2015)
+    parser.add_argument('--last-year', type=int, default=2050)
+    parser.add_argument('--jmp-extra-countries', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(generate(
+        args.output, args.countries, args.scenarios, args.first_year, args.last_year,
+        args.jmp_extra_countries, args.seed
+    ))
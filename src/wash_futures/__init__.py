@@ -0,0 +1,14 @@
+"""
+WASH Futures Explorer data transformation.
+
+The pipeline stages live in their own modules (`ifs`, `graph`, `progress_rates`, `jmp`, `post`) and are
+run by `pipeline.build()` or the `wash-futures build` command. Importing the package does not load pandas.
+"""
+
+__version__ = '0.1.0'
+
+
+def build(*args, **kwargs):
+    from .pipeline import build as pipeline_build
+
+    return pipeline_build(*args, **kwargs)
@@ -0,0 +1,139 @@
+"""
+Command line interface.
+
+    wash-futures build [--input-dir input_data] [--output-dir output_data] [--store-dir builds] [--only ifs table_jmp.csv ...] [--countries Ghana ...]
+    wash-futures watch [--input-dir input_data] [--output-dir output_data] [--debounce 2]
+    wash-futures rollback [--output-dir output_data]
+    wash-futures compare OLD NEW [--rtol 1e-6]
+
+Only the standard library is imported here, pandas is loaded when a stage actually runs.
+"""
+
+import sys
+import argparse
+
+from .paths import Paths
+from .quality import QualityError
+
+
+def build_command(args):
+    from .config import load_config
+    from .pipeline import build
+
+    paths = Paths(args.input_dir, args.output_dir, args.tests_dir, args.store_dir, args.cache_dir)
+    config = load_config(args.config)
+    build(
+        paths, config, only=args.only, countries=args.countries,
+        profile_memory=args.profile_memory, profile_slowest=args.profile_slowest
+    )
+    return 0
+
+
+def watch_command(args):
+    from .config import load_config
+    from .watch import watch
+
+    paths = Paths(args.input_dir, args.output_dir, args.tests_dir, args.store_dir, args.cache_dir)
+    watch(paths, load_config(args.config), args.debounce, args.poll_interval, args.initial_build)
+    return 0
+
+
+def rollback_command(args):
+    from .publish import rollback
+
+    rollback(args.output_dir)
+    return 0
+
+
+def compare_command(args):
+    from .compare import main as compare_main
+
+    return compare_main(args.arguments)
+
+
+def add_location_arguments(parser):
+    parser.add_argument('--input-dir', default='input_data', help='Directory holding the IFs/ and JMP/ inputs')
+    parser.add_argument('--output-dir', default='output_data', help='Directory for the table_* and key_* outputs')
+    parser.add_argument('--tests-dir', default='tests', help="Directory for the intermediate check files ('' to skip them)")
+    parser.add_argument(
+        '--store-dir', help='Build store recording the published outputs and their changes since the previous build'
+    )
+    parser.add_argument('--cache-dir', default='.cache', help="Directory of the caches kept between runs ('' to skip them)")
+    parser.add_argument('--config', help='Pipeline configuration file (defaults to the packaged pipeline.toml)')
+
+
+def get_parser():
+    from .pipeline import TARGETS
+
+    parser = argparse.ArgumentParser(prog='wash-futures', description='WASH Futures Explorer data transformation.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Transform the IFs and JMP inputs into the output tables')
+    add_location_arguments(build_parser)
+    build_parser.add_argument(
+        '--only', nargs='+', action='extend', choices=TARGETS, metavar='STAGE',
+        help='Rebuild only these stages (or the stages of these output tables), keeping the other outputs and the existing key tables'
+    )
+    build_parser.add_argument(
+        '--countries', nargs='+', action='extend', metavar='COUNTRY',
+        help='Rebuild only these countries (names or ISO3 codes) and replace their rows in the existing outputs, keeping the key table IDs'
+    )
+    build_parser.add_argument(
+        '--profile-memory', action='store_true', help='Record the peak memory of every stage with tracemalloc (several times slower)'
+    )
+    build_parser.add_argument('--profile-slowest', action='store_true', help='Dump the cProfile stats of the slowest stage')
+    build_parser.set_defaults(func=build_command)
+
+    watch_parser = subparsers.add_parser('watch', help='Rebuild the outputs affected by every change of the inputs')
+    add_location_arguments(watch_parser)
+    watch_parser.add_argument(
+        '--debounce', type=float, default=2.0, help='Seconds without changes before a rebuild starts (default: 2)'
+    )
+    watch_parser.add_argument(
+        '--poll-interval', type=float, help='Poll the inputs every this many seconds instead of using inotify'
+    )
+    watch_parser.add_argument(
+        '--no-initial-build', dest='initial_build', action='store_false', help='Wait for a change before the first build'
+    )
+    watch_parser.set_defaults(func=watch_command)
+
+    rollback_parser = subparsers.add_parser('rollback', help='Swap the outputs with the ones of the previous build')
+    rollback_parser.add_argument('--output-dir', default='output_data', help='Directory of the published outputs')
+    rollback_parser.set_defaults(func=rollback_command)
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two outputs keyed on their dimension columns', add_help=False)
+    compare_parser.add_argument('arguments', nargs=argparse.REMAINDER)
+    compare_parser.set_defaults(func=compare_command)
+    return parser
+
+
+def check_countries(parser, args):
+    # Unknown --countries are reported as argument errors, with their closest known names
+    from .config import load_config
+    from .pipeline import select_countries
+
+    try:
+        select_countries(args.countries, load_config(args.config))
+    except ValueError as error:
+        parser.error(str(error))
+
+
+def main(argv=None):
+    parser = get_parser()
+    # The compare options are parsed by compare.main, REMAINDER alone misses the ones before the files
+    args, unknown = parser.parse_known_args(argv)
+    if unknown:
+        if args.command != 'compare':
+            parser.error(f"unrecognized arguments: {' '.join(unknown)}")
+        args.arguments = unknown + args.arguments
+    if args.command == 'build' and args.countries:
+        check_countries(parser, args)
+    try:
+        return args.func(args)
+    except QualityError as error:
+        # The thresholds stopped the build, the violations are the message
+        parser.exit(1, f"{error}\n")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
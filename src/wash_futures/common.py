@@ -0,0 +1,121 @@
+"""
+1.B - 1.D. Common functions used by both data sources (IFS and JMP).
+
+- **merge_id**: Merges a data table with a key table on a common column, replaces missing ids with 0
+  (counted in the quality report) and renames the column for easier identification.
+- **cleanup_semicolon**: Removes the semicolons (;) included in the Excel format from IFS (the IFS readers
+  now skip them while reading, see inputs.py).
+- **create_table_key**: Generates (or extends) the `key_<column>.csv` table of a column.
+- **read_table_key**: Loads an existing `key_<column>.csv` table, as it was before the post data transform.
+- **save_table**: Writes an output table, or replaces the rows of some countries only in the existing one.
+"""
+
+import os
+import pandas as pd
+
+from .publish import wait_written, write_table
+from .quality import record
+
+
+# 4.B. Predefined strings replacing the raw values of the key tables once all the tables are saved
+KEY_VALUE_REPLACEMENTS = {
+    "commitment": {
+        "0.5x": "Halving",
+        "2x": "Doubling",
+        "4x": "Quadrupling",
+        "6x": "Six-Fold",
+        "Base": "Business-as-usual"
+    },
+    "actual_commitment": {
+        "0.5x": "Halving",
+        "2x": "Doubling",
+        "4x": "Quadrupling",
+        "6x": "Six-Fold",
+        "Base": "Business-as-usual"
+    },
+    "jmp_category": {
+        "ALB": "At Least Basic",
+        "SM": "Safely Managed",
+    },
+    "value_name": {
+        "FS": "Full Sanitation Access",
+        "FW": "Full Water Access"
+    },
+}
+
+
+def merge_id(prev_table, keys_table, name):
+    merged_df = prev_table.merge(keys_table, left_on=name, right_on=name, how='left')
+    merged_df = merged_df.rename(columns={'id': f'{name}_id'})
+    unmatched = merged_df[f'{name}_id'].isna()
+    record('unmatched_id', unmatched & merged_df[name].notna(), name)
+    merged_df = merged_df.drop(columns=[name])
+    merged_df[f'{name}_id'] = merged_df[f'{name}_id'].where(~unmatched, 0).astype(int)
+    return merged_df
+
+
+def cleanup_semicolon(source):
+    with open(source, 'r') as file:
+        content = file.read()
+    # Only rewritten when needed, so the inputs keep their modification time (watch mode)
+    if ';' in content:
+        with open(source, 'w') as file:
+            file.write(content.replace(';', ''))
+
+
+def read_table_key(output_dir, column):
+    """
+    Loads `key_<column>.csv` with the predefined strings of the post data transform reverted,
+    so the keys can be matched against freshly processed data. Returns None if the file is missing.
+    """
+    file_path = f'{output_dir}/key_{column}.csv'
+    if not os.path.exists(file_path):
+        return None
+    existing_table = pd.read_csv(file_path)
+    replacements = KEY_VALUE_REPLACEMENTS.get(column)
+    if replacements:
+        existing_table[column] = existing_table[column].replace({v: k for k, v in replacements.items()})
+    return existing_table
+
+
+def create_table_key(dataframe, column, output_dir):
+    file_path = f'{output_dir}/key_{column}.csv'
+    new_table = pd.DataFrame(
+        dataframe[column].unique(),
+        columns=[column]
+    ).dropna().sort_values(column).reset_index(drop=True)
+
+    # If the file already exists, load it
+    existing_table = read_table_key(output_dir, column)
+    if existing_table is not None:
+        # Find the new values that are not in the existing table
+        new_values = new_table[~new_table[column].isin(existing_table[column])]
+        if not new_values.empty:
+            # Assign IDs to the new values, starting after the max existing ID
+            max_id = existing_table['id'].max()
+            new_values['id'] = range(max_id + 1, max_id + 1 + len(new_values))
+            # Append the new values to the existing table
+            updated_table = pd.concat([existing_table, new_values], ignore_index=True)
+        else:
+            updated_table = existing_table  # No new values to add, keep existing table as is
+    else:
+        # If the file doesn't exist, create new IDs starting from 1
+        new_table['id'] = range(1, len(new_table) + 1)
+        updated_table = new_table
+    write_table(updated_table[['id', column]], file_path, wait=True)
+    return updated_table
+
+
+def save_table(dataframe, file, column=None, values=None):
+    """
+    Writes an output table. With `values`, only the rows whose `column` is in `values` are replaced:
+    the rows of the other values are kept from the existing file and the new rows are appended after them.
+    """
+    wait_written(file)
+    if values is not None and os.path.exists(file):
+        # Round trip parsing, so the kept rows are written back unchanged
+        existing_table = pd.read_csv(file, float_precision='round_trip')
+        dataframe = pd.concat([existing_table[~existing_table[column].isin(values)], dataframe], ignore_index=True)
+    write_table(dataframe, file)
+    return dataframe
+
@@ -0,0 +1,209 @@
+"""
+Golden output comparison.
+
+Compares two pipeline outputs (e.g. `tests/ifs-testing.prev.csv` against `tests/ifs-testing.csv`,
+a saved `tests/original_data.csv` against a fresh one, or two `output_data/table_*.csv`) keyed on
+their dimension columns. Rows are aligned with a single integer join key built from the factorized
+dimension columns and numeric values are compared with a relative/absolute tolerance, so the full
+`original_data.csv` is checked in seconds. NumPy and pandas are imported by the functions comparing,
+so `wash-futures compare --help` starts without them.
+
+Example:
+
+    wash-futures compare tests/ifs-testing.prev.csv tests/ifs-testing.csv
+    wash-futures compare old/table_ifs.csv new/table_ifs.csv --rtol 1e-9 --report tests/table_ifs.diff.csv
+
+With `--ifs`, two IFs access exports of the same indicator are compared on their ALB and SM values,
+whatever their 2nd dimension layout (e.g. a "Basic + Safely Managed" export against an "At Least Basic" one).
+Only the rows of both exports are compared, the others are counted.
+
+    wash-futures compare --ifs "IFs/13. ... (2nd Dimensions = Basic + Safely Managed).csv" "IFs TESTING/13. ... At Least Basic.csv"
+"""
+
+import os
+import sys
+import argparse
+import importlib.util
+
+
+DIMENSION_COLUMNS = [
+    'indicator', 'year', 'actual_year', 'country', 'unit', 'value_name', 'jmp_category', 'jmp_name',
+    'commitment', 'actual_commitment', 'value_type', '2nd_dimension', 'full_wash_coverage',
+]
+# Columns used to group the discrepancies, when present
+SUMMARY_COLUMNS = ['indicator', 'indicator_id', 'country', 'country_id']
+
+READ_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+
+def load_output(path, ifs=False):
+    import pandas as pd
+
+    if ifs:
+        from .ifs import read_ifs_categories
+
+        return read_ifs_categories(path)
+    if READ_ENGINE == 'pyarrow':
+        return pd.read_csv(path, engine='pyarrow')
+    return pd.read_csv(path, low_memory=False)
+
+
+def infer_columns(dataframe, keys=None):
+    """Splits the columns into dimension keys and numeric value columns."""
+    import pandas as pd
+
+    if keys is None:
+        keys = [
+            c for c in dataframe.columns
+            if c in DIMENSION_COLUMNS or c.endswith('_id') or dataframe[c].dtype == object
+        ]
+    values = [
+        c for c in dataframe.columns
+        if c not in keys and (pd.api.types.is_numeric_dtype(dataframe[c]) or pd.api.types.is_bool_dtype(dataframe[c]))
+    ]
+    return keys, values
+
+
+def join_codes(old, new, keys, values):
+    """
+    Builds one int64 code per row from the factorized key columns of both frames, so the
+    frames can be aligned with an integer join instead of a multi column string merge.
+    Duplicated keys are told apart by their occurrence number, taken in value order so the
+    same duplicates line up on both sides.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes = np.zeros(len(old) + len(new), dtype=np.int64)
+    for column in keys:
+        column_values = pd.concat([old[column], new[column]], ignore_index=True)
+        column_codes, uniques = pd.factorize(column_values, use_na_sentinel=False)
+        codes = codes * (len(uniques) + 1) + column_codes
+        # Keep the mixed radix code small enough to stay exact
+        codes = pd.factorize(codes)[0].astype(np.int64)
+    old_codes, new_codes = codes[:len(old)], codes[len(old):]
+    old_occurrence = occurrence(old_codes, old, values)
+    new_occurrence = occurrence(new_codes, new, values)
+    radix = max(old_occurrence.max(initial=0), new_occurrence.max(initial=0)) + 1
+    return old_codes * radix + old_occurrence, new_codes * radix + new_occurrence
+
+
+def occurrence(codes, dataframe, values):
+    import numpy as np
+
+    result = np.zeros(len(codes), dtype=np.int64)
+    if len(codes) == len(np.unique(codes)):
+        return result
+    # np.lexsort uses the last array as the primary key
+    order = np.lexsort([dataframe[c].to_numpy(dtype=float, na_value=np.nan) for c in reversed(values)] + [codes])
+    sorted_codes = codes[order]
+    group_start = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+    positions = np.arange(len(codes))
+    result[order] = positions - np.repeat(group_start, np.diff(np.r_[group_start, len(codes)]))
+    return result
+
+
+def compare_outputs(old, new, keys=None, values=None, rtol=1e-6, atol=1e-9):
+    """
+    Returns a long frame with one row per discrepancy: the dimension keys, the value column,
+    the old and new values and the status (`changed`, `missing` in the new output or `added`).
+    """
+    import numpy as np
+    import pandas as pd
+
+    inferred_keys, inferred_values = infer_columns(old, keys)
+    keys = keys or inferred_keys
+    values = values or [c for c in inferred_values if c in new.columns]
+    missing_keys = [k for k in keys if k not in new.columns]
+    if missing_keys:
+        raise ValueError(f"Key columns missing in the new output: {missing_keys}")
+
+    old = old.reset_index(drop=True)
+    new = new.reset_index(drop=True)
+    old_codes, new_codes = join_codes(old, new, keys, values)
+
+    left = pd.DataFrame({'code': old_codes, 'row_old': np.arange(len(old))})
+    right = pd.DataFrame({'code': new_codes, 'row_new': np.arange(len(new))})
+    joined = left.merge(right, on='code', how='outer', indicator=True)
+    both = (joined['_merge'] == 'both').to_numpy()
+    row_old = joined['row_old'].to_numpy()
+    row_new = joined['row_new'].to_numpy()
+
+    discrepancies = []
+    for status, mask, source, rows in [
+        ('missing', joined['_merge'].eq('left_only').to_numpy(), old, row_old),
+        ('added', joined['_merge'].eq('right_only').to_numpy(), new, row_new),
+    ]:
+        if mask.any():
+            found = source.iloc[rows[mask].astype(np.int64)][keys].reset_index(drop=True)
+            found['column'] = None
+            found['status'] = status
+            discrepancies.append(found)
+
+    matched_old = row_old[both].astype(np.int64)
+    matched_new = row_new[both].astype(np.int64)
+    for column in values:
+        a = old[column].to_numpy(dtype=float, na_value=np.nan)[matched_old]
+        b = new[column].to_numpy(dtype=float, na_value=np.nan)[matched_new]
+        changed = ~np.isclose(a, b, rtol=rtol, atol=atol, equal_nan=True)
+        if changed.any():
+            found = old.iloc[matched_old[changed]][keys].reset_index(drop=True)
+            found['column'] = column
+            found['status'] = 'changed'
+            found['old'] = a[changed]
+            found['new'] = b[changed]
+            found['abs_diff'] = np.abs(a[changed] - b[changed])
+            discrepancies.append(found)
+
+    columns = keys + ['column', 'status', 'old', 'new', 'abs_diff']
+    if not discrepancies:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(discrepancies, ignore_index=True).reindex(columns=columns)
+
+
+def summarize(discrepancies):
+    """Counts the discrepancies per indicator/country and status with the largest absolute difference."""
+    by = [c for c in SUMMARY_COLUMNS if c in discrepancies.columns] + ['status', 'column']
+    summary = discrepancies.fillna({'column': '-'}).groupby(by, dropna=False).agg(
+        rows=('status', 'size'),
+        max_abs_diff=('abs_diff', 'max'),
+    )
+    return summary.reset_index().sort_values('rows', ascending=False, kind='stable')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='wash-futures compare', description='Compare two pipeline outputs keyed on their dimension columns.')
+    parser.add_argument('old', nargs='?', default='tests/ifs-testing.prev.csv')
+    parser.add_argument('new', nargs='?', default='tests/ifs-testing.csv')
+    parser.add_argument('--keys', nargs='+', help='Dimension columns (inferred when omitted)')
+    parser.add_argument('--values', nargs='+', help='Value columns to compare (all numeric when omitted)')
+    parser.add_argument('--rtol', type=float, default=1e-6)
+    parser.add_argument('--atol', type=float, default=1e-9)
+    parser.add_argument('--report', help='CSV file for the row level discrepancies')
+    parser.add_argument('--ifs', action='store_true', help='Compare two IFs exports on their shared ALB/SM values')
+    args = parser.parse_args(argv)
+
+    old = load_output(args.old, args.ifs)
+    new = load_output(args.new, args.ifs)
+    discrepancies = compare_outputs(old, new, args.keys, args.values, args.rtol, args.atol)
+    print(f"old: {args.old} ({len(old)} rows)")
+    print(f"new: {args.new} ({len(new)} rows)")
+    if args.ifs:
+        # Rows in one of the exports only are categories or scenarios the other layout doesn't have
+        not_shared = discrepancies['status'].isin(['missing', 'added'])
+        if not_shared.any():
+            print(f"Not in both exports: {discrepancies[not_shared]['status'].value_counts().to_dict()}")
+        discrepancies = discrepancies[~not_shared]
+    if discrepancies.empty:
+        print("No discrepancies")
+        return 0
+    print(discrepancies['status'].value_counts().to_string())
+    print(summarize(discrepancies).head(50).to_string(index=False))
+    report = args.report or f"{os.path.splitext(args.new)[0]}.diff.csv"
+    discrepancies.to_csv(report, index=False)
+    print(f"Discrepancies saved to {report}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
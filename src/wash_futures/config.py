@@ -0,0 +1,133 @@
+"""
+Pipeline configuration.
+
+`pipeline.toml` (or the file given with `--config`) is loaded and validated once into a PipelineConfig:
+sets and dicts for the membership checks of the stages and one IfsFile per IFs export with its
+attributes (indicator name, WASH, expenditure, year range, graph inclusion) computed up front.
+"""
+
+import os
+import re
+import functools
+
+from .countries import CountryResolver
+from .inputs import find_input, input_name
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline.toml')
+
+
+def get_ifs_name(source):
+    """
+    Indicator name of an IFS file: without the directory, the numbering, the extension and the 2nd dimension
+    text, i.e. "(2nd Dimensions = ...)", a single category suffix (", At Least Basic") or the country of a
+    country export ("(DRC)", "(DRC ALL CATEGORIES)").
+    """
+    source = re.sub(r"\s*\(2nd Dimension.*?\)", "", input_name(source))
+    source = re.sub(r"^\d+\. ", "", source).replace(".csv", "")
+    source = re.sub(r"\s*\([A-Z]{2,3}(?: ALL CATEGORIES)?\)$", "", source)
+    return re.sub(r",\s*(?:At Least Basic|Safely Managed|SafelyManaged|Basic)$", "", source)
+
+
+class IfsFile:
+    def __init__(self, name, year_range=False, graph=False, wash=None, expenditure=None, indicator=None, outcome=None):
+        self.name = name
+        self.indicator = indicator or get_ifs_name(name)
+        self.year_range = year_range
+        self.graph = graph
+        self.outcome = outcome
+        self.wash = wash if wash is not None else ("Water Service" in name or "Sanitation Service" in name)
+        self.expenditure = expenditure if expenditure is not None else "Expenditure" in name
+
+    def path(self, ifs_input_dir):
+        # The export as named in the config or compressed (inputs.py)
+        return find_input(os.path.join(ifs_input_dir, self.name))
+
+    def __repr__(self):
+        return f"IfsFile({self.name!r})"
+
+
+class PipelineConfig:
+    def __init__(self, data, source=None):
+        self.source = source
+        years = _require(data, 'years', dict, source)
+        self.initial_year = _require(years, 'initial_year', int, source)
+        first_year, last_year = _require(years, 'year_range', list, source)
+        if first_year > last_year:
+            raise ValueError(f"{source}: years.year_range must be [first, last], got {[first_year, last_year]}")
+        self.range_years = frozenset(range(first_year, last_year + 1))
+        self.milestone_years = frozenset(_require(years, 'milestone_years', list, source))
+
+        ifs = _require(data, 'ifs', dict, source)
+        self.ifs_files = []
+        for entry in _require(ifs, 'files', list, source):
+            unknown = set(entry) - {'name', 'year_range', 'graph', 'wash', 'expenditure', 'indicator', 'outcome'}
+            if 'name' not in entry or unknown:
+                raise ValueError(f"{source}: invalid ifs.files entry {entry}")
+            self.ifs_files.append(IfsFile(**entry))
+        self.files_by_name = {f.name: f for f in self.ifs_files}
+        if len(self.files_by_name) != len(self.ifs_files):
+            raise ValueError(f"{source}: duplicated ifs.files names")
+        self.year_range_files = frozenset(f.name for f in self.ifs_files if f.year_range)
+        self.graph_indicators = frozenset(f.indicator for f in self.ifs_files if f.graph)
+        self.expenditure_indicators = frozenset(f.indicator for f in self.ifs_files if f.expenditure)
+        self.outcomes = {f.indicator: f.outcome for f in self.ifs_files if f.outcome}
+
+        scenario_pairs = data.get('scenario_pairs', {})
+        self.pair_years = frozenset(scenario_pairs.get('years', []))
+        self.pair_top_k = scenario_pairs.get('top_k', 0)
+        self.pair_min_abs_delta = float(scenario_pairs.get('min_abs_delta', 0.0))
+        if not isinstance(self.pair_top_k, int) or self.pair_top_k < 0 or self.pair_min_abs_delta < 0:
+            raise ValueError(f"{source}: scenario_pairs.top_k and scenario_pairs.min_abs_delta must not be negative")
+
+        uncertainty = data.get('uncertainty', {})
+        self.uncertainty_draws = uncertainty.get('draws', 0)
+        self.uncertainty_seed = uncertainty.get('seed', 0)
+        self.uncertainty_rate_error = float(uncertainty.get('rate_error', 0.5))
+        self.uncertainty_rate_years = uncertainty.get('rate_years', 5)
+        self.uncertainty_multiplier_error = float(uncertainty.get('multiplier_error', 0.2))
+        if not isinstance(self.uncertainty_draws, int) or self.uncertainty_draws < 0 or self.uncertainty_rate_error < 0 \
+                or not 0 <= self.uncertainty_multiplier_error <= 1 or self.uncertainty_rate_years < 1:
+            raise ValueError(
+                f"{source}: uncertainty.draws and uncertainty.rate_error must not be negative, uncertainty.rate_years "
+                f"must be at least 1 and uncertainty.multiplier_error between 0 and 1"
+            )
+
+        self.quality_thresholds = dict(data.get('quality', {}))
+        self.partitioned = bool(data.get('output', {}).get('partitioned', False))
+
+        countries = _require(data, 'countries', dict, source)
+        self.ifs_countries = tuple(_require(countries, 'ifs', list, source))
+        self.country_mapping = dict(countries.get('mapping', {}))
+        self.country_aliases = {country: list(names) for country, names in countries.get('aliases', {}).items()}
+        self.country_iso3 = dict(countries.get('iso3', {}))
+        # Resolver of the country names of the inputs, see countries.py
+        self.countries = CountryResolver(self.country_mapping, self.country_aliases, self.country_iso3, self.ifs_countries)
+
+    def years_for(self, ifs_file):
+        return self.range_years if ifs_file.year_range else self.milestone_years
+
+    def graph_indicator_ids(self, indicator_table):
+        return self.indicator_ids(indicator_table, self.graph_indicators)
+
+    @staticmethod
+    def indicator_ids(indicator_table, indicators):
+        return list(indicator_table[indicator_table['indicator'].isin(indicators)]['id'])
+
+
+def _require(data, key, kind, source):
+    if key not in data or not isinstance(data[key], kind):
+        raise ValueError(f"{source}: '{key}' is missing or is not a {kind.__name__}")
+    return data[key]
+
+
+@functools.lru_cache(maxsize=None)
+def load_config(path=None):
+    path = os.path.abspath(path or DEFAULT_CONFIG_FILE)
+    with open(path, 'rb') as file:
+        return PipelineConfig(tomllib.load(file), source=path)
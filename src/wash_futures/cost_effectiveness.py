@@ -0,0 +1,88 @@
+"""
+3.F. IFS Cost-Effectiveness Table
+
+Relates the spend of the expenditure indicators (capital and maintenance, water and sanitation) to the
+outcome indicators (`outcome` in the config) per country, scenario and year, so the dashboard doesn't
+have to join the indicators of `table_ifs.csv` at view time:
+
+- **additional_spend**: cumulative spend of the scenario minus the Business-as-usual one, summed over the
+  expenditure indicators (Billion $).
+- **outcome_averted**: Business-as-usual cumulative outcome minus the scenario one (Millions of people).
+- **cost_per_outcome**: additional spend per person of outcome averted ($), empty when nothing is averted.
+
+The spend is taken from `table_ifs.csv` and joined on the JMP category of the scenario, so it only covers
+the expenditure category kept by the ALB/SafelyManaged cleanup (3.B.1): for an At Least Basic scenario,
+the Safely Managed spend is removed there and not counted, and its additional spend and cost per outcome
+are lower than the spend of both categories.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .common import create_table_key, merge_id, save_table
+
+
+# Units of the expenditure (Billion $) and outcome (Millions) indicators
+SPEND_UNIT = 1e9
+OUTCOME_UNIT = 1e6
+
+scenario_columns = ['year', 'country_id', 'value_name_id', 'jmp_name_id', 'jmp_category_id', 'commitment_id']
+
+cost_effectiveness_columns = scenario_columns + [
+    'indicator_id', 'outcome_id', 'cumulative_spend', 'additional_spend', 'outcome_averted', 'cost_per_outcome'
+]
+
+
+def load_ifs_table(ifs_output_file):
+    # Round trip parsing, so the table is the same as the one built from the in-memory IFS table
+    return pd.read_csv(ifs_output_file, float_precision='round_trip')
+
+
+def create_outcome_keys(config, output_dir):
+    outcomes = pd.DataFrame({'outcome': list(config.outcomes.values())})
+    return create_table_key(outcomes, 'outcome', output_dir)
+
+
+def build_cost_effectiveness_table(final_ifs, expenditure_ids, outcome_ids, outcome_keys):
+    """
+    One row per scenario cell (country, scenario, year) and outcome indicator, `outcome_ids` maps the
+    outcome indicator ids to their outcome name. Business-as-usual rows have no delta and are left out.
+    The spend is the one of the JMP category of the scenario cell only (the rows kept in table_ifs).
+    """
+    scenarios = final_ifs[final_ifs['base_cumulative_value'].notna()]
+
+    # Summed in indicator order, so the result doesn't depend on the row order of table_ifs
+    expenditure = scenarios[scenarios['indicator_id'].isin(expenditure_ids)].sort_values(by='indicator_id', kind='stable')
+    spend = expenditure.assign(
+        cumulative_spend=expenditure['cumulative_value'],
+        additional_spend=expenditure['cumulative_value'] - expenditure['base_cumulative_value'],
+    ).groupby(scenario_columns, as_index=False)[['cumulative_spend', 'additional_spend']].sum(min_count=1)
+
+    outcomes = scenarios[scenarios['indicator_id'].isin(list(outcome_ids))]
+    outcomes = pd.DataFrame({
+        **{column: outcomes[column] for column in scenario_columns + ['indicator_id']},
+        'outcome': outcomes['indicator_id'].map(outcome_ids),
+        'outcome_averted': outcomes['base_cumulative_value'] - outcomes['cumulative_value'],
+    })
+
+    table = outcomes.merge(spend, on=scenario_columns, how='inner')
+    averted = table['outcome_averted'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost = table['additional_spend'].to_numpy() * SPEND_UNIT / (averted * OUTCOME_UNIT)
+    table['cost_per_outcome'] = np.where(averted > 0, cost, np.nan)
+    table = merge_id(table, outcome_keys, 'outcome')
+    return table[cost_effectiveness_columns].sort_values(by=['year', 'country_id', 'commitment_id'], kind='stable').reset_index(drop=True)
+
+
+def build_cost_effectiveness(paths, config, keys, final_ifs=None, country_ids=None):
+    if final_ifs is None:
+        final_ifs = load_ifs_table(paths.ifs_output_file)
+    if country_ids is not None:
+        final_ifs = final_ifs[final_ifs['country_id'].isin(country_ids)]
+    outcome_keys = create_outcome_keys(config, paths.output_dir)
+    indicator_ids = dict(zip(keys['indicator']['indicator'], keys['indicator']['id']))
+    outcome_ids = {indicator_ids[indicator]: outcome for indicator, outcome in config.outcomes.items() if indicator in indicator_ids}
+    expenditure_ids = config.indicator_ids(keys['indicator'], config.expenditure_indicators)
+    table = build_cost_effectiveness_table(final_ifs, expenditure_ids, outcome_ids, outcome_keys)
+    save_table(table, paths.ifs_ce_output_file, 'country_id', country_ids)
+    return table
@@ -0,0 +1,154 @@
+"""
+1.D. Country Names
+
+Resolves the country names of the IFs and JMP exports (or of any other naming scheme) to the names used
+in the outputs:
+
+- **CountryResolver.resolve**: the output name of a name, from the `countries.mapping` and `countries.aliases`
+  config, the ISO3 codes (`countries.iso3`) or the known country with the same name once case, accents,
+  punctuation and word order are ignored. The other names are kept as they are.
+- **CountryResolver.map**: resolves a column once per unique name (map on a categorical), not once per row.
+- **CountryIndex**: character trigram index of a list of names, the closest names of a name are only scored
+  against the names sharing trigrams with it instead of the whole list.
+- **report_country_matches**: prints the closest JMP names of the IFs countries missing from the JMP export.
+
+With a cache file (`.cache/country_resolution.json`), the resolved names and the close matches are saved
+and reused by the next runs as long as the config and the names don't change.
+"""
+
+import os
+import re
+import json
+import difflib
+import hashlib
+import unicodedata
+from collections import Counter
+
+
+MATCH_COUNT = 3
+MATCH_CUTOFF = 0.4
+# Names scored with difflib per lookup, among the ones sharing the most trigrams
+CANDIDATE_COUNT = 20
+
+
+def normalize_name(name):
+    """Lowercase words without accents and punctuation, in alphabetical order."""
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode()
+    return " ".join(sorted(re.sub(r"[^a-z0-9]+", " ", name.lower()).split()))
+
+
+def fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=sorted).encode()).hexdigest()[:16]
+
+
+class CountryIndex:
+    def __init__(self, names):
+        self.names = list(dict.fromkeys(names))
+        self.grams = {}
+        for i, name in enumerate(self.names):
+            for gram in self.trigrams(name):
+                self.grams.setdefault(gram, []).append(i)
+
+    @staticmethod
+    def trigrams(name):
+        padded = f"  {normalize_name(name)} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def close_matches(self, name, n=MATCH_COUNT, cutoff=MATCH_CUTOFF):
+        """
+        `difflib.get_close_matches(name, names, n, cutoff)` on the names sharing the most trigrams with the
+        name, the names without any common trigram are not matches.
+        """
+        shared = Counter(i for gram in self.trigrams(name) for i in self.grams.get(gram, ()))
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(name)
+        scores = []
+        for i, _ in shared.most_common(CANDIDATE_COUNT):
+            matcher.set_seq1(self.names[i])
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff and matcher.ratio() >= cutoff:
+                scores.append((matcher.ratio(), self.names[i]))
+        return [candidate for _, candidate in sorted(scores, reverse=True)[:n]]
+
+
+class CountryResolver:
+    def __init__(self, mapping=None, aliases=None, iso3=None, known=()):
+        self.mapping = dict(mapping or {})
+        self.known = [self.mapping.get(country, country) for country in known]
+        # Alternative names and ISO3 codes of the output names
+        for country, names in (aliases or {}).items():
+            for name in names:
+                self.mapping.setdefault(name, country)
+        for country, code in (iso3 or {}).items():
+            self.mapping.setdefault(code, country)
+        self.normalized = {normalize_name(country): country for country in self.known}
+        self.config_fingerprint = fingerprint(self.mapping, self.known)
+        self.resolved, self.matches = {}, {}
+        self.cache_file = None
+        self._changed = False
+
+    def use_cache(self, cache_file):
+        """Loads the resolutions of a cache file made with the same config, and saves the new ones there."""
+        if cache_file != self.cache_file and cache_file and os.path.exists(cache_file):
+            with open(cache_file) as file:
+                cache = json.load(file)
+            if cache.get('config') == self.config_fingerprint:
+                self.resolved.update(cache['resolved'])
+                for names, matches in cache['matches'].items():
+                    self.matches.setdefault(names, {}).update(matches)
+        self.cache_file = cache_file
+
+    def resolve(self, name):
+        if not isinstance(name, str):
+            return name
+        if name not in self.resolved:
+            if name in self.mapping:
+                country = self.mapping[name]
+            else:
+                country = self.normalized.get(normalize_name(name), name)
+            self.resolved[name] = country
+            self._changed = True
+        return self.resolved[name]
+
+    def get(self, name, default=None):
+        # Same interface as the former mapping dict, a name is always resolved (to itself by default)
+        return self.resolve(name)
+
+    def map(self, names):
+        """The output names of a Series of names, resolved once per unique name."""
+        categories = names.astype('category')
+        resolved = {name: self.resolve(name) for name in categories.cat.categories}
+        return categories.map(resolved).astype(object)
+
+    def close_matches(self, name, index):
+        """Close matches of a name among the names of a CountryIndex, cached per list of names."""
+        matches = self.matches.setdefault(fingerprint(index.names), {})
+        if name not in matches:
+            matches[name] = index.close_matches(name)
+            self._changed = True
+        return matches[name]
+
+    def save(self):
+        if not self.cache_file or not self._changed:
+            return
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        with open(f'{self.cache_file}.tmp', 'w') as file:
+            json.dump({'config': self.config_fingerprint, 'resolved': self.resolved, 'matches': self.matches}, file, indent=2)
+        os.replace(f'{self.cache_file}.tmp', self.cache_file)
+        self._changed = False
+
+
+def report_country_matches(jmp_country_list, ifs_country_list, resolver=None):
+    """Prints the closest JMP names of the IFs countries which are not in the JMP export once resolved."""
+    import pandas as pd
+
+    resolver = resolver or CountryResolver()
+    jmp_countries = set(resolver.map(pd.Series(jmp_country_list, dtype=object)))
+    index = CountryIndex(jmp_country_list)
+    for country in ifs_country_list:
+        if resolver.resolve(country) in jmp_countries:
+            continue
+        probability = resolver.close_matches(country, index)
+        if probability:
+            print(f"{country} -> {list(probability)}")
+        else:
+            print(f"NOT FOUND: {country}")
@@ -0,0 +1,120 @@
+"""
+Dense representation of one IFS indicator.
+
+An IFS export is a full grid of countries × scenarios × 2nd dimensions × years, so instead of
+looking the values up row by row in the long frame, an IfsCube holds them in a float array with
+one labelled axis per column of `AXES`. Cells missing from the export are NaN.
+
+- **IfsCube.from_long** / **IfsCube.to_long**: convert from and to the long frame.
+- **IfsCube.locate** / **IfsCube.take**: cell coordinates of the rows of a long frame and the values
+  at those coordinates, to write the results back to the frame without joins.
+- **IfsCube.save** / **IfsCube.load**: `.npy` values and `.json` axes, loaded memory-mapped by default
+  so several processes can share the same indicator.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+
+AXES = ('country', 'scenario', '2nd_dimension', 'year')
+
+
+class IfsCube:
+    def __init__(self, values, axes):
+        self.values = values
+        self.axes = {name: pd.Index(labels) for name, labels in axes.items()}
+        shape = tuple(len(labels) for labels in self.axes.values())
+        if self.values.shape != shape:
+            raise ValueError(f"values of shape {self.values.shape} don't match the axes {shape}")
+
+    @classmethod
+    def from_long(cls, dataframe, value_column='value', axes=AXES):
+        """
+        Builds the cube of a long frame. The years are sorted, the other labels keep their order of
+        appearance. If a cell appears more than once, the first row wins (as the row lookups did).
+        """
+        codes, labels = [], {}
+        for name in axes:
+            axis_codes, axis_labels = pd.factorize(dataframe[name], sort=(name == 'year'))
+            codes.append(axis_codes)
+            labels[name] = axis_labels
+        shape = tuple(len(axis_labels) for axis_labels in labels.values())
+        cells, first_rows = np.unique(np.ravel_multi_index(codes, shape), return_index=True)
+        values = np.full(shape, np.nan)
+        values.flat[cells] = dataframe[value_column].to_numpy(dtype=float)[first_rows]
+        return cls(values, labels)
+
+    def to_long(self, value_column='value'):
+        coordinates = np.nonzero(~np.isnan(self.values))
+        long = {name: labels[axis_codes] for (name, labels), axis_codes in zip(self.axes.items(), coordinates)}
+        long[value_column] = self.values[coordinates]
+        return pd.DataFrame(long)
+
+    def locate(self, dataframe):
+        coordinates = tuple(labels.get_indexer(dataframe[name]) for name, labels in self.axes.items())
+        if any((axis_codes < 0).any() for axis_codes in coordinates):
+            raise KeyError("the frame has rows outside of the cube axes")
+        return coordinates
+
+    def take(self, coordinates):
+        return self.values[coordinates]
+
+    def axis_number(self, axis):
+        return list(self.axes).index(axis)
+
+    def with_values(self, values):
+        return IfsCube(values, self.axes)
+
+    def add_into(self, axis, target, source):
+        """Adds the `source` slice of an axis to the `target` slice (ALB = Basic + SafelyManaged)."""
+        labels = self.axes[axis]
+        values = self.values.copy()
+        if target in labels and source in labels:
+            number = self.axis_number(axis)
+            target_slice = [slice(None)] * values.ndim
+            source_slice = [slice(None)] * values.ndim
+            target_slice[number] = labels.get_loc(target)
+            source_slice[number] = labels.get_loc(source)
+            target_values = values[tuple(target_slice)]
+            source_values = values[tuple(source_slice)]
+            values[tuple(target_slice)] = np.where(np.isnan(source_values), target_values, target_values + source_values)
+        return self.with_values(values)
+
+    def cumulative(self, after_year):
+        """
+        Cumulative sum over the years after `after_year`, NaN for the earlier years and the missing cells.
+        The sum is compensated (Kahan) the same way as the pandas groupby cumsum, so the results don't drift.
+        """
+        number = self.axis_number('year')
+        values = np.moveaxis(np.full(self.values.shape, np.nan), number, 0)
+        yearly_values = np.moveaxis(self.values, number, 0)
+        accumulated = np.zeros(values.shape[1:])
+        compensation = np.zeros(values.shape[1:])
+        for i in np.flatnonzero(self.axes['year'] > after_year):
+            present = ~np.isnan(yearly_values[i])
+            y = np.where(present, yearly_values[i] - compensation, 0.0)
+            t = accumulated + y
+            compensation = np.where(present, t - accumulated - y, compensation)
+            compensation[np.isnan(compensation)] = 0.0
+            accumulated = np.where(present, t, accumulated)
+            values[i] = np.where(present, t, np.nan)
+        return self.with_values(np.moveaxis(values, 0, number))
+
+    def broadcast(self, axis, label):
+        """The values of one label of an axis repeated for every label of that axis (all NaN if the label is missing)."""
+        labels = self.axes[axis]
+        if label not in labels:
+            return np.full(self.values.shape, np.nan)
+        return np.broadcast_to(self.values.take([labels.get_loc(label)], axis=self.axis_number(axis)), self.values.shape)
+
+    def save(self, path):
+        np.save(f"{path}.npy", self.values)
+        with open(f"{path}.json", 'w') as file:
+            json.dump({name: labels.tolist() for name, labels in self.axes.items()}, file)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(f"{path}.json") as file:
+            axes = json.load(file)
+        return cls(np.load(f"{path}.npy", mmap_mode=mmap_mode), axes)
@@ -0,0 +1,191 @@
+"""
+Stage Graph
+
+The pipeline stages as a graph: each Stage names the stages whose results it needs (`requires`), the ones
+it only runs after when they run too (`after`) and the output files it writes (`outputs`). `StageGraph.run`
+only runs the stages the requested ones (or the stages writing the requested files) depend on, in
+dependency order.
+
+The results of the expensive pure steps (parsing an IFs file, collecting the progress rates, processing
+the JMP export) are memoized on disk with a StageCache: a result is saved under the hash of the code
+version and of its inputs (file contents, config values) and loaded instead of computed as long as they
+don't change. The quality counts recorded while computing it are saved with it and replayed.
+"""
+
+import os
+import copy
+import glob
+import json
+import pickle
+import hashlib
+import functools
+
+from . import quality
+
+
+# Entries kept per memoized step, so a country build or a partial rebuild doesn't evict the full build ones
+ENTRIES_PER_STEP = 4
+KEY_LENGTH = 24
+
+
+class Stage:
+    def __init__(self, name, run, requires=(), after=(), outputs=()):
+        self.name = name
+        self.run = run
+        self.requires = tuple(requires)
+        self.after = tuple(after)
+        self.outputs = tuple(outputs)
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+class StageGraph:
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        self.producers = {output: stage.name for stage in stages for output in stage.outputs}
+
+    def targets(self):
+        return list(self.stages) + list(self.producers)
+
+    def stage_name(self, target):
+        """The stage of a target, a stage name or the name of an output file."""
+        name = self.producers.get(os.path.basename(target), target)
+        if name not in self.stages:
+            raise ValueError(f"Unknown stage or output {target!r}. Known: {', '.join(self.targets())}")
+        return name
+
+    def plan(self, targets):
+        """The stages to run for the targets, each one after the stages it requires or comes after."""
+        needed = set()
+
+        def visit(name):
+            if name not in needed:
+                needed.add(name)
+                for required in self.stages[name].requires:
+                    visit(required)
+
+        for target in targets:
+            visit(self.stage_name(target))
+
+        ordered, done = [], set()
+
+        def place(name, path=()):
+            if name in path:
+                raise ValueError(f"Stage cycle: {' -> '.join(path + (name,))}")
+            if name in done:
+                return
+            stage = self.stages[name]
+            for previous in stage.requires + tuple(n for n in stage.after if n in needed):
+                place(previous, path + (name,))
+            done.add(name)
+            ordered.append(stage)
+
+        for name in self.stages:
+            if name in needed:
+                place(name)
+        return ordered
+
+    def run(self, targets, context):
+        """Runs the planned stages, the result of each stage is stored in `context` under its name."""
+        for stage in self.plan(targets):
+            context[stage.name] = stage.run(context)
+        return context
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Digest of the package sources, so a code change invalidates the memoized results."""
+    digest = hashlib.sha256()
+    for file in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(file, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    On disk memoization of stage results, the entries of the `entries_per_step` most recently used inputs
+    of each memoized step (by modification time on disk). With `keep_in_memory`, the entries are also kept
+    loaded between the runs of a long-running process (and only there when `cache_dir` is empty).
+    """
+
+    def __init__(self, cache_dir, keep_in_memory=False, entries_per_step=ENTRIES_PER_STEP):
+        self.cache_dir = cache_dir
+        self.memory = {} if keep_in_memory else None
+        self.entries_per_step = entries_per_step
+        # Paths of the entries kept in memory per step, the most recently used last
+        self.names = {}
+
+    def key(self, name, inputs):
+        content = json.dumps([code_version(), name, inputs], sort_keys=True, default=sorted)
+        return hashlib.sha256(content.encode()).hexdigest()[:KEY_LENGTH]
+
+    def entry(self, name, key):
+        safe_name = "".join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+        return os.path.join(self.cache_dir or '', f"{safe_name}-{key}.pkl"), safe_name
+
+    def cached(self, name, inputs, compute, stage=None):
+        """
+        The result of `compute()` for these inputs, loaded from the cache when it was already computed.
+        `stage` (a profiler record) gets `cached = True` when the result is reused.
+        """
+        path, safe_name = self.entry(name, self.key(name, inputs))
+        entry = self.memory.get(path) if self.memory is not None else None
+        if entry is None and self.cache_dir and os.path.exists(path):
+            with open(path, 'rb') as file:
+                entry = pickle.load(file)
+        if entry is not None:
+            self.keep(name, path, entry)
+            if self.cache_dir and os.path.exists(path):
+                # Marks the entry as recently used
+                os.utime(path)
+            quality.replay(entry['quality'])
+            if stage is not None:
+                stage['cached'] = True
+            # The stages may change the results they get, the kept ones stay as they were
+            return copy.deepcopy(entry['result']) if self.memory is not None else entry['result']
+
+        with quality.capture() as records:
+            result = compute()
+        entry = {'result': result, 'quality': records}
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(f"{path}.tmp", 'wb') as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{path}.tmp", path)
+            self.evict(safe_name)
+        if self.memory is not None:
+            self.keep(name, path, copy.deepcopy(entry))
+        return result
+
+    def evict(self, safe_name):
+        # Removes the least recently used entries of a step on disk
+        entries = glob.glob(os.path.join(self.cache_dir, f"{glob.escape(safe_name)}-{'[0-9a-f]' * KEY_LENGTH}.pkl"))
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for previous in entries[self.entries_per_step:]:
+            os.remove(previous)
+
+    def keep(self, name, path, entry):
+        # Like on disk, only the most recently used entries are kept per step
+        if self.memory is not None:
+            paths = [kept for kept in self.names.get(name, []) if kept != path] + [path]
+            for previous in paths[:-self.entries_per_step]:
+                self.memory.pop(previous, None)
+            self.memory[path] = entry
+            self.names[name] = paths[-self.entries_per_step:]
+
+
+class NullCache:
+    """Same interface as StageCache, always computing."""
+
+    def cached(self, name, inputs, compute, stage=None):
+        return compute()
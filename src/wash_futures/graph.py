@@ -0,0 +1,47 @@
+"""
+3.D.3. IFS Graph Table
+
+Table for the first graph of the dashboard: the access indicators per year, grouped in the 2030 and
+2050 milestones, with the Business-as-usual values repeated for every commitment.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .publish import write_table
+
+
+def build_graph_table(ifs_table_with_id, graph_indicator_ids):
+    # First Graph (indicators with `graph = true` in the config)
+
+    graph_with_id = ifs_table_with_id[ifs_table_with_id['indicator_id'].isin(graph_indicator_ids)].drop(columns=['remove'])
+    graph_with_id = graph_with_id.copy()
+    graph_with_id.loc[:, 'actual_year'] = graph_with_id['year']
+    graph_with_id.loc[:, 'year'] = graph_with_id['year'].apply(lambda x: 2030 if x <= 2030 else 2050)
+    graph_with_id.loc[:, 'value'] = graph_with_id.apply(lambda x: x['value'] if (x['2030'] is not np.nan or x['2050'] is not np.nan or x['base_value'] is np.nan) else np.nan, axis=1)
+    graph_with_id = graph_with_id[['actual_year','year','country_id','indicator_id','value_name_id','jmp_name_id','jmp_category_id','commitment_id','value']]
+
+    # Duplicate Year 2030 so it can be shown in 2050
+
+    replicate_for_2050 = graph_with_id[graph_with_id['year'] == 2030].copy()
+    replicate_for_2050.loc[:, 'year'] = 2050
+    combined_graph = pd.concat([graph_with_id, replicate_for_2050], ignore_index=True)
+    combined_graph = combined_graph.dropna(subset=['value'])
+
+    combined_graph['full_wash_coverage'] = 1
+    combined_graph['actual_commitment_id'] = combined_graph['commitment_id']
+
+    base_commitment = combined_graph[combined_graph['commitment_id'] == 5].copy()
+    base_commitment.loc[:, 'full_wash_coverage'] = 0
+    for a in range(1,5):
+        base_commitment.loc[:, 'commitment_id'] = a
+        combined_graph = pd.concat([combined_graph, base_commitment], ignore_index=True)
+    return combined_graph
+
+
+def save_actual_commitment(output_dir):
+    # Duplicate Commitment Key for Legend
+    actual_commitment = pd.read_csv(f"{output_dir}/key_commitment.csv")
+    actual_commitment = actual_commitment.rename(columns={"commitment":"actual_commitment"})
+    write_table(actual_commitment, f"{output_dir}/key_actual_commitment.csv", wait=True)
+    return actual_commitment
@@ -0,0 +1,472 @@
+"""
+3. IFS Dataset
+
+IFS functions are a collection of functions used only by IFS data source
+
+- **base_jmp_category**: Assigns or updates the JMP category of the base records, converting the base
+  categories to simplified abbreviations ("BS" or "SM"), otherwise retains the existing category.
+- **get_value_types**: Splits the scenario name into value name, JMP category and commitment. It replaces
+  '_0_' with '_0.' since '_0_5' is '0.5'.
+- **cleanup_data**: Unifies the unit formatting ("Billion 2017" to "Billion") and handles space and empty
+  value issues in the "value" column.
+- **filter_dataframe_by_year**: Filters by year range or by milestone years, depending on the file config.
+- **normalize_dimension**: Unifies the 2nd dimension labels of the IFS exports ("Safely Managed" to
+  "SafelyManaged", "At Least Basic" to "AtLeastBasic").
+- **remove_unmatches_jmp_category**: True for the rows where the JMP category does not match the 2nd dimension.
+- **remove_unmatch_commitment**: True for the rows where the commitment year does not match the data year.
+"""
+
+import os
+import re
+import csv
+import itertools
+import numpy as np
+import pandas as pd
+
+from .common import create_table_key, merge_id, save_table
+from .cube import AXES, IfsCube
+from .dag import NullCache, file_digest
+from .inputs import open_input
+from .profiler import NullProfiler
+from .publish import write_table
+from .quality import record, scope
+
+
+final_columns = ['indicator','year','country','unit','value_name','jmp_category','commitment','value','base_value','initial_value','cumulative_value','base_cumulative_value','2030','2050']
+
+# Rows before the data: title, country, 2nd dimension, (skipped), unit and scenario
+IFS_HEADER_ROWS = 6
+
+# 2nd dimensions of the access indicators by their letters in lower case, and the ones holding the ALB value
+# (Basic before the SafelyManaged value is added, AtLeastBasic when the export has it already)
+JMP_DIMENSIONS = {"basic": "Basic", "safelymanaged": "SafelyManaged", "atleastbasic": "AtLeastBasic"}
+ALB_DIMENSIONS = ["Basic", "AtLeastBasic"]
+
+original_data_columns = ["year","country","value_type","value_name","jmp_category","commitment","value","cumulative_value","indicator"]
+
+# 3.C.5. JMP Names Table (Custom)
+jmp_names_table = pd.DataFrame([
+    {"id": 1,"jmp_name": "Water"},
+    {"id": 2,"jmp_name": "Sanitation"},
+    {"id": 3,"jmp_name": "Water and Sanitation"}
+])
+jmp_dict = dict(zip(jmp_names_table['jmp_name'], jmp_names_table['id']))
+
+
+# 3.A. IFS Functions
+
+def base_jmp_category(x):
+    if "Base" in str(x["value_name"]):
+        if "Basic" in x["2nd_dimension"]:
+            return "BS"
+        if "Safely" in x["2nd_dimension"]:
+            return "SM"
+        return np.nan
+    return x["jmp_category"]
+
+
+def get_value_types(lst):
+    lst = lst.split('.')[0]
+    lst = lst.replace('_0_','_0.').split("_")
+    return lst
+
+
+def cleanup_data(dataframe):
+    dataframe['unit'] = dataframe['unit'].apply(lambda x: x.replace("2017","") if x else None)
+    dataframe['value'] = dataframe['value'].apply(lambda x: x.replace(' ','') if ' ' in str(x) else x)
+    dataframe['value'] = dataframe['value'].apply(lambda x: x if len(str(x)) > 0 else np.nan)
+
+
+def filter_dataframe_by_year(dataframe, ifs_file, config):
+    # Filter using the year_range or the milestone_years
+    filtered_df = dataframe[dataframe['year'].isin(config.years_for(ifs_file))]
+    return filtered_df.reset_index(drop=True)
+
+
+def normalize_dimension(label):
+    return JMP_DIMENSIONS.get(re.sub(r"[^a-z]", "", label.lower()), label)
+
+
+def get_ifs_dimension(source):
+    # Single 2nd dimension named by the file name, for the exports without it in the header
+    name = os.path.basename(source)
+    match = re.search(r"\(2nd Dimensions? = ([^)+]+)\)", name) or re.search(r",\s*(At Least Basic|Safely Managed)\b", name)
+    if match:
+        dimension = normalize_dimension(match.group(1))
+        if dimension in JMP_DIMENSIONS.values():
+            return dimension
+    return None
+
+
+def remove_unmatches_jmp_category(dataframe):
+    not_base = dataframe["value_name"] != "Base"
+    alb_dimension = dataframe["2nd_dimension"].isin(ALB_DIMENSIONS) & (dataframe["jmp_category"] == "SM")
+    sm_dimension = (dataframe["2nd_dimension"] == "SafelyManaged") & dataframe["jmp_category"].isin(["ALB", "BS"])
+    return not_base & (alb_dimension | sm_dimension)
+
+
+def remove_unmatch_commitment(x):
+    # 07 October 2024 https://akvo.slack.com/archives/C070F7D7VFS/p1728289594284939?thread_ts=1728268592.335199&cid=C070F7D7VFS
+    if "2030" in x['commitment']:
+        if x["year"] == 2050:
+            return True
+        if x["year"] > 2030:
+            return True
+        # if str(x["year"]).strip() != "2030":
+        #    return True
+    if "2050" in x['commitment']:
+        if x["year"] == 2030:
+            return True
+        # if str(x["year"]).strip() != "2050":
+        #    return True
+    return False
+
+
+def add_initial_value_for_wash(dataframe):
+    # Base value of the min year with the same indicator, country and JMP category, for the 2022, 2030 and 2050 rows
+    # (every scenario starts from the Base history, taking it from Base keeps it independent of the row order)
+    key_columns = ['indicator', 'country', 'jmp_category']
+    first_rows = dataframe[(dataframe['year'] == dataframe['year'].min()) & (dataframe['value_name'] == "Base")]
+    first_rows = first_rows.drop_duplicates(subset=key_columns)
+    first_values = first_rows.set_index(key_columns)['value']
+    initial_value = first_values.reindex(pd.MultiIndex.from_frame(dataframe[key_columns])).to_numpy()
+    matched = dataframe['year'].isin([2022, 2030, 2050]) & dataframe['jmp_category'].notna()
+    return np.where(matched, initial_value, np.nan)
+
+
+def add_base_value(dataframe, cube, is_wash_data=True):
+    """
+    Value of the Base scenario in the same cell of the cube (country and year, and 2nd dimension for the WASH data),
+    for the other scenarios. For the WASH data the JMP category must match the Base one as well (ALB for Basic, SM
+    for SafelyManaged).
+    """
+    base_value = cube.take(cube.locate(dataframe))
+    matched = dataframe['value_name'] != "Base"
+    if is_wash_data:
+        base_category = np.select(
+            [dataframe['2nd_dimension'].str.contains("Basic"), dataframe['2nd_dimension'].str.contains("Safely")],
+            ["ALB", "SM"], default=None)
+        matched &= dataframe['jmp_category'] == base_category
+    return np.where(matched, base_value, np.nan)
+
+
+def modify_commitment_name(x):
+    commitment_name = str(x['commitment']).strip()
+    if x["value_name"] == "Base":
+        return "Base"
+    if "2030" in commitment_name or "2050" in commitment_name:
+        value_name = x['value_name']
+        if 'W' in value_name and 'S' in value_name:
+            value_name = "Water and Sanitation"
+        if 'W' in value_name:
+            value_name = "Water"
+        if 'S' in value_name:
+            value_name = "Sanitation"
+        return f"Full {value_name} Access in {commitment_name}"
+    return x['commitment']
+
+
+# 3.B. IFS Data Processing
+
+def read_ifs_header(file):
+    """
+    Column labels of an IFS export: (country, 2nd dimension, unit, scenario) per column, from the header
+    rows 1, 2, 4 and 5, with the empty cells named as `pd.read_csv(header=[1,2,4,5])` does.
+    """
+    with open_input(file, strip=';') as csv_file:
+        rows = list(itertools.islice(csv.reader(csv_file), IFS_HEADER_ROWS))
+    levels = [rows[row] for row in (1, 2, 4, 5)]
+    n_columns = max(len(level) for level in levels)
+    return [
+        tuple(level[i] if i < len(level) and level[i] else f"Unnamed: {i}_level_{k}" for k, level in enumerate(levels))
+        for i in range(n_columns)
+    ]
+
+
+def read_ifs_file(file, country_mapping, first_year=None, last_year=None, countries=None, scenarios=None, dimensions=None):
+    """
+    Reads an IFS export (4 header rows: country, 2nd dimension, unit and scenario) into a long
+    DataFrame with one row per year, country, 2nd dimension and scenario.
+
+    The access categories of the 2nd dimension are normalized (`normalize_dimension`), taken from the
+    file name for the single category exports without them in the header. The At Least Basic columns
+    are skipped when the export has the Basic ones, since ALB is Basic + SafelyManaged.
+
+    The filters are applied while parsing: only the columns of `countries` (names after the country
+    mapping), `scenarios` (labels of the 5th header row, e.g. "Base") and `dimensions` (normalized 2nd
+    dimensions, e.g. to skip the other categories of an "ALL CATEGORIES" export) are read, and only the
+    years between `first_year` and `last_year` are melted. None keeps everything.
+
+    The file can be compressed (see inputs.py), its semicolons are skipped while it is read.
+    """
+    file_dimension = get_ifs_dimension(file)
+    labels = [
+        (country, file_dimension if file_dimension and dimension.startswith("Unnamed: ") else normalize_dimension(dimension), unit, scenario)
+        for country, dimension, unit, scenario in read_ifs_header(file)
+    ]
+    has_basic = any(label[1] == "Basic" for label in labels)
+    usecols = [0] + [
+        i for i, (country, dimension, _, scenario) in enumerate(labels) if i > 0 and
+        (countries is None or country_mapping.get(country, country) in countries) and
+        (scenarios is None or scenario in scenarios) and
+        (dimensions is None or dimension in dimensions) and
+        not (has_basic and dimension == "AtLeastBasic")
+    ]
+    with open_input(file, strip=';') as stream:
+        data = pd.read_csv(stream, header=None, skiprows=IFS_HEADER_ROWS, usecols=usecols, sep=',')
+    years = data.pop(0).astype(int).to_numpy()
+    selected = np.ones(len(years), dtype=bool)
+    if first_year is not None:
+        selected &= years >= first_year
+    if last_year is not None:
+        selected &= years <= last_year
+    data, years = data[selected], years[selected]
+    # One row per cell, column by column (the order of the former melt)
+    columns = [labels[i] for i in data.columns]
+    value_types = pd.Series([list(filter(lambda v:v, get_value_types(column[3]))) for column in columns], dtype=object)
+    return pd.DataFrame({
+        "year": np.tile(years, len(columns)),
+        "country": np.repeat([country_mapping.get(column[0], column[0]) for column in columns], len(years)).astype(object),
+        "2nd_dimension": np.repeat([column[1] for column in columns], len(years)).astype(object),
+        "unit": np.repeat([column[2] for column in columns], len(years)).astype(object),
+        "scenario": np.repeat([column[3] for column in columns], len(years)).astype(object),
+        "value_type": value_types.repeat(len(years)).to_numpy(),
+        "value": data.melt(value_name='value')['value'].to_numpy() if len(columns) else [],
+    })
+
+
+def read_ifs_categories(file, country_mapping=None):
+    """
+    ALB and SM values of an IFS access export of any 2nd dimension layout, per country, scenario, JMP category
+    and year, so exports of the same indicator with different layouts can be compared.
+    """
+    df = read_ifs_file(file, country_mapping or {}, dimensions=JMP_DIMENSIONS.values())
+    df['value'] = pd.to_numeric(df['value'], errors='coerce')
+    cube = IfsCube.from_long(df).add_into('2nd_dimension', "Basic", "SafelyManaged")
+    categories = cube.to_long()
+    categories['jmp_category'] = categories.pop('2nd_dimension').map({"Basic": "ALB", "AtLeastBasic": "ALB", "SafelyManaged": "SM"})
+    return categories[['country', 'scenario', 'jmp_category', 'year', 'value']]
+
+
+def split_value_types(df, ifs_file):
+    # Reindexed since a file read with the Base scenario only has the value name
+    df_split = pd.DataFrame(df['value_type'].tolist(), index=df.index).reindex(columns=range(3))
+    df_split.columns = ['value_name', 'jmp_category', 'commitment']
+    df_final = pd.concat([df, df_split], axis=1)
+
+    df_final['indicator'] = ifs_file.indicator
+    df_final['jmp_category'] = df_final.apply(base_jmp_category, axis=1)
+    df_final['jmp_category'] = df_final['jmp_category'].replace({"BS": "ALB"})
+
+    df_final['commitment'] = df_final.apply(modify_commitment_name, axis=1)
+    return df_final
+
+
+def process_ifs_file(file, ifs_file, config, profiler=None, stage=None, countries=None):
+    """
+    3.B.1. Combine, Filter and Remap the values of one IFS file (of the given countries only, if any).
+    Returns the final and the original data.
+    """
+    profiler = profiler or NullProfiler()
+    stage = stage if stage is not None else {}
+    profiler.start("parse")
+    # The years before the initial year are never used. The years between the milestones are read for
+    # every file since the cumulative values (and the original data) need them.
+    df = read_ifs_file(
+        file, config.countries, first_year=config.initial_year, countries=countries,
+        dimensions=JMP_DIMENSIONS.values() if ifs_file.wash else None
+    )
+    stage['rows_read'] = len(df)
+    profiler.stop(rows=len(df))
+    if df.empty:
+        # None of the countries are in this export (e.g. a country build), nothing to remap
+        print(f"[EMPTY]: {file}")
+        return pd.DataFrame(columns=final_columns), pd.DataFrame(columns=original_data_columns)
+
+    df_final = split_value_types(df, ifs_file)
+    # Add Missing Base Category
+    df_final['jmp_category'] = df_final['jmp_category'].fillna("Base")
+
+    # Make sure that all value is numeric
+    values = pd.to_numeric(df_final['value'], errors='coerce')
+    record('coerced', values.isna() & df_final['value'].notna(), 'value')
+    record('zero_filled', values.isna(), 'value')
+    df_final['value'] = values.fillna(0)
+
+    # The 2nd dimension of the other indicators is a single unnamed column per country and scenario
+    cube = IfsCube.from_long(df_final, axes=AXES if ifs_file.wash else ('country', 'scenario', 'year'))
+
+    # Add Value for ALB
+    if ifs_file.wash:
+        if not ifs_file.expenditure:
+            with profiler.stage("get_alb_value", rows=len(df_final)):
+                cube = cube.add_into('2nd_dimension', "Basic", "SafelyManaged")
+                df_final['value'] = cube.take(cube.locate(df_final))
+
+    # Remove ALB From SafelyManaged
+    df_final['remove'] = remove_unmatches_jmp_category(df_final)
+    record('dropped', df_final['remove'], 'jmp_category')
+    df_final = df_final[df_final['remove'] == False].reset_index(drop=True)
+    # End Remove
+
+    # Add cumulative column per country, scenario and 2nd dimension
+    # Exclude rows with year to cumulative == initial year (2019)
+    cumulative_cube = cube.cumulative(after_year=config.initial_year)
+    df_final['cumulative_value'] = cumulative_cube.take(cumulative_cube.locate(df_final))
+
+    # collect original data for checking (rows of the initial year last, before sorting by year)
+    excluded_cumulative = df_final['year'] == config.initial_year
+    df_final = pd.concat([df_final[~excluded_cumulative], df_final[excluded_cumulative]]).sort_values(by='year').reset_index(drop=True)
+    df_final['jmp_category'] = df_final['jmp_category'].replace('Base', np.nan)
+
+    original_data = df_final[original_data_columns].dropna(axis=1, how='all')
+    df_final = filter_dataframe_by_year(df_final, ifs_file, config)
+
+    # Add initial value column
+    df_final['initial_value'] = np.nan
+    df_final['base_value'] = np.nan
+    df_final['base_cumulative_value'] = np.nan
+    df_final['2030'] = np.nan
+    df_final['2050'] = np.nan
+    profiler.start("add_base_value", rows=len(df_final))
+    base_cube = cube.with_values(cube.broadcast('scenario', "Base"))
+    base_cumulative_cube = cumulative_cube.with_values(cumulative_cube.broadcast('scenario', "Base"))
+    if ifs_file.wash:
+        df_final['initial_value'] = add_initial_value_for_wash(df_final)
+        df_final['base_value'] = add_base_value(df_final, base_cube)
+        df_final['base_cumulative_value'] = add_base_value(df_final, base_cumulative_cube)
+        print(f"[WASH] : {file}")
+    else:
+        df_final['base_value'] = add_base_value(df_final, base_cube, is_wash_data = False)
+        df_final['base_cumulative_value'] = add_base_value(df_final, base_cumulative_cube, is_wash_data = False)
+        print(f"[OTHER]: {file}")
+    profiler.stop()
+    if not ifs_file.year_range:  # remove after get initial value (for non wash)
+        df_final = df_final[df_final['year'] != config.initial_year].reset_index(drop=True)
+    else:
+        df_final['2030'] = df_final.apply(lambda x: float(x["value"]) if "2030" in x["commitment"] else np.nan, axis=1)
+        df_final['2050'] = df_final.apply(lambda x: float(x["value"]) if "2050" in x["commitment"] else np.nan, axis=1)
+    return df_final[final_columns], original_data
+
+
+def ifs_file_inputs(file, ifs_file, config, countries=None):
+    """What the result of process_ifs_file depends on, the key of its memoized result."""
+    return [
+        file_digest(file), vars(ifs_file), config.initial_year, config.years_for(ifs_file),
+        config.countries.config_fingerprint, countries,
+    ]
+
+
+def build_ifs_dataset(paths, config, profiler=None, countries=None, cache=None):
+    """
+    3.B. Processes every IFS file into a unified DataFrame (combined_df), flags the rows whose
+    commitment doesn't match the year (`remove`) and cleans up the units and values.
+    With `countries`, only those countries are processed and replaced in the check files.
+    With a StageCache, the files which didn't change since the last run are not processed again.
+    """
+    profiler = profiler or NullProfiler()
+    cache = cache or NullCache()
+    combined_df = pd.DataFrame(columns=final_columns)
+    original_data = pd.DataFrame(columns=original_data_columns)
+    for ifs_file in config.ifs_files:
+        file = ifs_file.path(paths.ifs_input_dir)
+        with profiler.stage(f"3.B.1 {ifs_file.name}") as stage, scope("3.B.1", ifs_file.name):
+            df_final, file_original_data = cache.cached(
+                f"3.B.1 {ifs_file.name}", ifs_file_inputs(file, ifs_file, config, countries),
+                lambda: process_ifs_file(file, ifs_file, config, profiler, stage, countries), stage,
+            )
+            # combine original data for testing
+            original_data = pd.concat([file_original_data, original_data], ignore_index=True)
+            with profiler.stage("concat"):
+                combined_df = pd.concat([combined_df.dropna(axis=1, how='all'), df_final], ignore_index=True)
+            stage['rows'] = len(df_final)
+    # save the original data to a file
+    original_data_file = paths.tests_file("original_data.csv")
+    if original_data_file:
+        with profiler.stage("3.B.1 Save Original Data", rows=len(original_data)):
+            save_table(original_data, original_data_file, 'country', countries)
+
+    # Remove rows when commitment doesn't match with the year
+    profiler.start("3.B.2 IFS Data Cleanup", rows=len(combined_df))
+    # 07 October 2024 https://akvo.slack.com/archives/C070F7D7VFS/p1728289594284939?thread_ts=1728268592.335199&cid=C070F7D7VFS
+    combined_df['remove'] = combined_df.apply(lambda x: remove_unmatch_commitment(x), axis=1)
+    with scope("3.B.2", "table_ifs"):
+        record('dropped', combined_df['remove'], 'commitment')
+    # The removal is executed before saving because we need the commitment per year for the IFS graphic table.
+    cleanup_data(combined_df)
+    profiler.stop()
+
+    # To check the results before merging with the ID
+    testing_file = paths.tests_file("ifs-testing.csv")
+    if testing_file:
+        testing = combined_df[combined_df['remove'] == False].reset_index(drop=True).copy()
+        testing = testing.drop(columns=['remove'])
+        save_table(testing, testing_file, 'country', countries)
+    return combined_df
+
+
+# 3.C. IFS Table of Keys
+
+def create_ifs_keys(combined_df, output_dir):
+    keys = {}
+    for column in ['indicator', 'unit', 'value_name', 'jmp_category']:
+        keys[column] = create_table_key(combined_df, column, output_dir)
+    write_table(jmp_names_table, f'{output_dir}/key_jmp_name.csv', wait=True)
+    keys['jmp_name'] = jmp_names_table
+    for column in ['commitment', 'country']:
+        keys[column] = create_table_key(combined_df, column, output_dir)
+    return keys
+
+
+# 3.D. IFS Table Results
+#
+# 3.D.1. Custom Table Mapping (JMP Name)
+#
+# - FS = Full Sanitation Access
+# - FW = Full Water Access
+# - FWS = Full Water and Sanitation Access
+# - SI = Sanitation Increased
+# - WI = Water Increased
+# - WSI = Water and Sanitation Increased
+
+def map_jmp_id(x):
+    value_name = x["value_name"]
+    # For the Base data
+    if value_name == "Base":
+        if x["indicator"].startswith("Water"):
+            return jmp_dict['Water']
+        if x["indicator"].startswith("Sanitation"):
+            return jmp_dict['Sanitation']
+    if 'W' in value_name and 'S' in value_name: # Water and Sanitation is indicated by 'WS' combined
+        return jmp_dict['Water and Sanitation']
+    if 'W' in value_name:  # Water is indicated by 'W'
+        return jmp_dict['Water']
+    if 'S' in value_name:  # Sanitation is indicated by 'S'
+        return jmp_dict['Sanitation']
+    return 0
+
+
+def build_ifs_table(combined_df, keys):
+    """3.D.1 - 3.D.3. Maps the IFS values to the key tables. The `remove` and 2030/2050 columns are kept for the graph table."""
+    combined_df = combined_df.copy()
+    combined_df['jmp_name_id'] = combined_df.apply(map_jmp_id, axis=1)
+
+    # 3.D.2. IFS Key Table Mapping
+    ifs_table_with_id = merge_id(combined_df, keys['indicator'], 'indicator')
+    ifs_table_with_id = merge_id(ifs_table_with_id, keys['unit'], 'unit')
+    ifs_table_with_id = merge_id(ifs_table_with_id, keys['value_name'], 'value_name')
+    ifs_table_with_id = merge_id(ifs_table_with_id, keys['jmp_category'], 'jmp_category')
+    ifs_table_with_id = merge_id(ifs_table_with_id, keys['commitment'], 'commitment')
+    ifs_table_with_id = merge_id(ifs_table_with_id, keys['country'], 'country')
+
+    # 3.D.3. IFS Final Result
+    ifs_table_with_id = ifs_table_with_id[ifs_table_with_id['value'].notna()].reset_index(drop=True)
+    ifs_table_with_id = ifs_table_with_id.sort_values(by='year').reset_index(drop=True)
+    return ifs_table_with_id
+
+
+def save_ifs_table(ifs_table_with_id, paths, country_ids=None):
+    final_ifs = ifs_table_with_id[ifs_table_with_id['remove'] == False].reset_index(drop=True)
+    final_ifs = final_ifs.drop(columns=['remove'])
+    save_table(final_ifs.drop(columns=['2030', '2050']), paths.ifs_output_file, 'country_id', country_ids)
+    return final_ifs
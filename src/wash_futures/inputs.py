@@ -0,0 +1,120 @@
+"""
+Compressed Inputs
+
+The IFs and JMP exports can be stored compressed, `.csv.gz`, `.csv.zst` (with the `zstandard` package)
+or a `.zip` holding a single CSV file, next to or instead of the `.csv` named in the config:
+
+- **find_input**: the file of a configured `.csv` path, the plain file or else its compressed version.
+- **open_input**: opens an input as text whatever its compression, detected from the extension or else
+  the magic bytes, decompressing while it is read (the whole file is never held in memory or on disk).
+  The characters of `strip` are removed while reading, e.g. the semicolons of the IFs Excel exports,
+  instead of rewriting the file (`cleanup_semicolon`).
+"""
+
+import io
+import os
+import gzip
+import zipfile
+
+
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd', '.zip': 'zip'}
+MAGIC_BYTES = {b'\x1f\x8b': 'gzip', b'\x28\xb5\x2f\xfd': 'zstd', b'PK\x03\x04': 'zip'}
+# Compressed versions of `name.csv`, in the order they are looked for
+COMPRESSED_SUFFIXES = ['.csv.gz', '.csv.zst', '.csv.zip', '.zip']
+
+
+def input_name(path):
+    """The `.csv` name of an input file, without its compression extension."""
+    name = os.path.basename(path)
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)] + '.csv'
+    return name
+
+
+def find_input(path):
+    """`path` when it exists, otherwise its first existing compressed version (or `path` when none)."""
+    if os.path.exists(path) or not path.lower().endswith('.csv'):
+        return path
+    for suffix in COMPRESSED_SUFFIXES:
+        candidate = path[:-len('.csv')] + suffix
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+def get_compression(path):
+    compression = COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+    if compression is None:
+        with open(path, 'rb') as file:
+            head = file.read(4)
+        compression = next((name for magic, name in MAGIC_BYTES.items() if head.startswith(magic)), None)
+    return compression
+
+
+def open_zstd(path):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(f"Reading {path} needs the zstandard package (pip install zstandard)") from None
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+
+def open_zip_member(path):
+    archive = zipfile.ZipFile(path)
+    members = [name for name in archive.namelist() if not name.endswith('/')]
+    csv_members = [name for name in members if name.lower().endswith('.csv')] or members
+    if len(csv_members) != 1:
+        archive.close()
+        raise ValueError(f"{path} must hold a single CSV file, found: {', '.join(members) or 'nothing'}")
+    # The member stays readable once the archive is closed
+    member = archive.open(csv_members[0])
+    archive.close()
+    return member
+
+
+def open_binary(path):
+    compression = get_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        return open_zstd(path)
+    if compression == 'zip':
+        return open_zip_member(path)
+    return open(path, 'rb')
+
+
+class StrippedReader(io.TextIOBase):
+    """Text stream without some characters."""
+
+    def __init__(self, stream, characters):
+        self.stream = stream
+        self.table = str.maketrans('', '', characters)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while True:
+            chunk = self.stream.read(size)
+            text = chunk.translate(self.table)
+            # An empty result is the end of the file, not a chunk made only of stripped characters
+            if text or not chunk or size is None or size < 0:
+                return text
+
+    def readline(self, size=-1):
+        while True:
+            line = self.stream.readline(size)
+            text = line.translate(self.table)
+            if text or not line:
+                return text
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+
+def open_input(path, encoding='utf-8', strip=''):
+    """Text stream of an input file, decompressed while it is read. The lines endings are kept as they are."""
+    stream = io.TextIOWrapper(open_binary(path), encoding=encoding, newline='')
+    return StrippedReader(stream, strip) if strip else stream
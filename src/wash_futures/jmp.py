@@ -0,0 +1,84 @@
+"""
+2. JMP Dataset
+
+Reshapes the JMP export (access levels and annual rates of change per country, year and service)
+into the long `table_jmp.csv` mapped to the IFS key tables.
+"""
+
+import pandas as pd
+
+from .common import create_table_key, merge_id
+from .inputs import open_input
+from .quality import record
+
+
+def read_jmp_file(jmp_input_file):
+    with open_input(jmp_input_file, encoding='latin-1') as stream:
+        return pd.read_csv(stream)
+
+
+# 2.A. JMP Data Processing
+
+def process_jmp_data(data, country_resolver):
+    # 2.A.1. Rename the columns
+    data = data.copy()
+    data.columns = [
+        'country',
+        'year',
+        'jmp_name',
+        'total_ALB',
+        'annual_rate_change_ALB',
+        'total_SM',
+        'annual_rate_change_SM',
+        'manual_rate_change_SM',
+        'manual_rate_change_ALB'
+    ]
+    data = data.drop(columns=[
+        'manual_rate_change_SM',
+        'manual_rate_change_ALB'
+    ])
+
+    # 2.A.2. Categorize the Values
+    data_melted = pd.melt(
+        data,
+        id_vars=['country', 'year', 'jmp_name'],  # columns to keep
+        var_name='variable',  # melted
+        value_name='value' # values
+    )
+    data_melted['value_type'] = data_melted['variable'].apply(lambda x: 'total' if 'total' in x else 'annual_rate_change')
+    data_melted['jmp_category'] = data_melted['variable'].apply(lambda x: 'ALB' if 'ALB' in x else 'SM')
+    data_melted['jmp_category'] = data_melted['jmp_category'].replace({"BS": "ALB"})
+    data_melted['country'] = country_resolver.map(data_melted['country'])
+    data_melted = data_melted.drop(columns=['variable'])
+    sentinel = data_melted['value'] == -99
+    record('sentinel_nan', sentinel, 'value')
+    data_melted['value'] = data_melted['value'].mask(sentinel)
+    return data_melted
+
+
+# 2.B. JMP Table Keys
+
+def create_jmp_keys(data_melted, output_dir):
+    return {
+        # 2.B.1. JMP Categories (Retry)
+        'jmp_category': create_table_key(data_melted, 'jmp_category', output_dir),
+        # 2.B.2. JMP Value Types
+        'value_type': create_table_key(data_melted, 'value_type', output_dir),
+    }
+
+
+# 2.C. JMP Table Results
+
+def build_jmp_table(data_melted, keys, jmp_keys):
+    # 2.C.1. JMP Key Table Mapping
+    jmp_table_with_id = merge_id(data_melted, jmp_keys['value_type'], 'value_type')
+    jmp_table_with_id = merge_id(jmp_table_with_id, keys['country'], 'country')
+    jmp_table_with_id = merge_id(jmp_table_with_id, keys['jmp_name'], 'jmp_name')
+    jmp_table_with_id = merge_id(jmp_table_with_id, jmp_keys['jmp_category'], 'jmp_category')
+
+    # 2.C.2. JMP Data Cleanup
+    # - Remove Nullable Country
+    unknown_country = jmp_table_with_id['country_id'] == 0
+    record('dropped', unknown_country, 'country')
+    jmp_table_with_id = jmp_table_with_id[~unknown_country].reset_index(drop=True)
+    return jmp_table_with_id
@@ -0,0 +1,106 @@
+"""
+Partitioned Output Tables
+
+With `output.partitioned` in the config, `table_ifs.csv`, `table_graph_ifs.csv` and `table_ifs_progress_rates.csv`
+are also written as one file per indicator and country, so a dashboard or a notebook only loads the slices it
+needs:
+
+    output_data/table_ifs/indicator_id=7/country_id=12.parquet
+    output_data/table_ifs/manifest.json
+
+The files are Parquet when pyarrow is installed, CSV otherwise. `manifest.json` lists the partitions with
+their row count and first and last year, so a slice can be found without opening the files
+(`load_partitions`).
+"""
+
+import os
+import json
+import shutil
+import importlib.util
+
+from .publish import write_table
+
+
+PARTITION_COLUMNS = ['indicator_id', 'country_id']
+PARTITION_FORMAT = 'parquet' if importlib.util.find_spec('pyarrow') else 'csv'
+
+
+def partition_path(indicator_id, country_id):
+    return f"indicator_id={indicator_id}/country_id={country_id}.{PARTITION_FORMAT}"
+
+
+def read_manifest(table_dir):
+    manifest_file = os.path.join(table_dir, 'manifest.json')
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file) as file:
+        return json.load(file)
+
+
+def save_partitioned_table(dataframe, table_dir, country_ids=None):
+    """
+    Writes the partitions of a table and its manifest. With `country_ids`, only the partitions of these
+    countries are replaced and the manifest keeps the other ones.
+    """
+    manifest = read_manifest(table_dir) if country_ids is not None else None
+    if manifest is None or manifest['format'] != PARTITION_FORMAT:
+        shutil.rmtree(table_dir, ignore_errors=True)
+        kept = []
+    else:
+        kept = [entry for entry in manifest['partitions'] if entry['country_id'] not in country_ids]
+        for entry in manifest['partitions']:
+            if entry['country_id'] in country_ids:
+                os.remove(os.path.join(table_dir, entry['path']))
+
+    partitions = []
+    for (indicator_id, country_id), rows in dataframe.groupby(PARTITION_COLUMNS, sort=True):
+        path = partition_path(indicator_id, country_id)
+        os.makedirs(os.path.join(table_dir, os.path.dirname(path)), exist_ok=True)
+        write_table(rows, os.path.join(table_dir, path))
+        partitions.append({
+            'path': path,
+            'indicator_id': int(indicator_id),
+            'country_id': int(country_id),
+            'rows': len(rows),
+            'min_year': int(rows['year'].min()),
+            'max_year': int(rows['year'].max()),
+        })
+    partitions = sorted(kept + partitions, key=lambda entry: (entry['indicator_id'], entry['country_id']))
+
+    manifest = {
+        'table': os.path.basename(os.path.normpath(table_dir)),
+        'format': PARTITION_FORMAT,
+        'partition_columns': PARTITION_COLUMNS,
+        'columns': list(dataframe.columns),
+        'rows': sum(entry['rows'] for entry in partitions),
+        'partitions': partitions,
+    }
+    os.makedirs(table_dir, exist_ok=True)
+    with open(os.path.join(table_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def load_partitions(table_dir, indicator_ids=None, country_ids=None, years=None):
+    """Rows of the partitions of some indicators, countries and years (all of them when not given)."""
+    import pandas as pd
+
+    manifest = read_manifest(table_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No partitioned table in {table_dir}")
+    first_year, last_year = (min(years), max(years)) if years else (None, None)
+    frames = []
+    for entry in manifest['partitions']:
+        if indicator_ids is not None and entry['indicator_id'] not in indicator_ids:
+            continue
+        if country_ids is not None and entry['country_id'] not in country_ids:
+            continue
+        if years and (entry['max_year'] < first_year or entry['min_year'] > last_year):
+            continue
+        path = os.path.join(table_dir, entry['path'])
+        if manifest['format'] == 'parquet':
+            frames.append(pd.read_parquet(path))
+        else:
+            frames.append(pd.read_csv(path, float_precision='round_trip'))
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=manifest['columns'])
+    return table[table['year'].isin(years)].reset_index(drop=True) if years else table
@@ -0,0 +1,60 @@
+"""
+1.A. Data Input and Output
+
+All the input and output locations of a pipeline run, resolved from the input, output and tests
+directories so the pipeline can run from anywhere.
+"""
+
+import os
+
+from .inputs import find_input
+
+
+class Paths:
+    def __init__(self, input_dir='input_data', output_dir='output_data', tests_dir='tests', store_dir=None, cache_dir='.cache'):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.tests_dir = tests_dir
+        # Build store of the published outputs, none by default
+        self.store_dir = store_dir
+        # Caches kept between runs (resolved country names, stage results), none when empty
+        self.cache_dir = cache_dir
+        self.ifs_input_dir = os.path.join(input_dir, 'IFs')
+        self.jmp_output_file = os.path.join(output_dir, 'table_jmp.csv')
+        self.ifs_output_file = os.path.join(output_dir, 'table_ifs.csv')
+        self.ifs_graph_output_file = os.path.join(output_dir, 'table_graph_ifs.csv')
+        self.ifs_pr_output_file = os.path.join(output_dir, 'table_ifs_progress_rates.csv')
+        self.ifs_ce_output_file = os.path.join(output_dir, 'table_ifs_cost_effectiveness.csv')
+        self.ifs_pairs_output_file = os.path.join(output_dir, 'table_ifs_scenario_pairs.csv')
+
+    @property
+    def jmp_input_file(self):
+        # jmp.csv or its compressed version (inputs.py)
+        return find_input(os.path.join(self.input_dir, 'JMP', 'jmp.csv'))
+
+    def with_output_dir(self, output_dir, tests_dir=None):
+        # Same locations with other output (and tests) directories, the staging ones of a build
+        return Paths(self.input_dir, output_dir, tests_dir or self.tests_dir, self.store_dir, self.cache_dir)
+
+    @property
+    def country_cache_file(self):
+        return os.path.join(self.cache_dir, 'country_resolution.json') if self.cache_dir else None
+
+    @property
+    def stage_cache_dir(self):
+        # Memoized stage results (dag.StageCache)
+        return os.path.join(self.cache_dir, 'stages') if self.cache_dir else None
+
+    def partition_dir(self, output_file):
+        # Directory of the partitioned version of an output table
+        return os.path.splitext(output_file)[0]
+
+    def key_file(self, column):
+        return os.path.join(self.output_dir, f'key_{column}.csv')
+
+    def tests_file(self, name):
+        # Intermediate results kept for checking, skipped when no tests directory is set
+        if not self.tests_dir:
+            return None
+        os.makedirs(self.tests_dir, exist_ok=True)
+        return os.path.join(self.tests_dir, name)
@@ -0,0 +1,334 @@
+"""
+Pipeline runner.
+
+Runs the stages of the data transformation in the order of the notebook sections:
+
+- **ifs**: 3.B - 3.D.2, the IFS dataset, its key tables and `table_ifs.csv`
+- **graph**: 3.D.3, `table_graph_ifs.csv` (with the uncertainty bands of 3.D.4) and `key_actual_commitment.csv`
+- **progress-rates**: 3.E, `table_ifs_progress_rates.csv`
+- **cost-effectiveness**: 3.F, `table_ifs_cost_effectiveness.csv` and `key_outcome.csv` (from `table_ifs.csv`
+  when the ifs stage doesn't run)
+- **scenario-pairs**: 3.G, `table_ifs_scenario_pairs.csv` and `key_scenario.csv` (from `table_ifs.csv` when
+  the ifs stage doesn't run)
+- **jmp**: 2, `table_jmp.csv`
+
+followed by the post data transform (4) of the key tables and the publishing of the outputs (4.C). The
+stages write to a staging directory which replaces the output directory once every table is verified
+and the data quality counts (`quality_report.csv`) are within the thresholds of the config,
+and with a build store (4.D) the published outputs and their deltas are recorded. With `output.partitioned`,
+the IFS, graph and progress rates tables are also written per indicator and country.
+
+A full build starts from an empty staging directory; a partial build starts from a copy of the current
+outputs and reuses the existing key tables, so the IDs of the rebuilt tables stay the same. A country
+build (`countries`) is a partial build as well: only the given countries are read and processed, and
+their rows (and partitions) are replaced in the existing tables. The stage modules are only imported
+when they run.
+
+The stages and the steps they depend on (the IFS dataset, its key tables) form a StageGraph: `only`
+accepts the stages or the output tables they write, and only the steps these need run. The parsed IFs
+files, the progress rates, the processed JMP export and its rates of change are memoized in the stage cache (`.cache/stages`),
+so they are only computed again when their inputs, the config or the code change.
+"""
+
+import os
+
+from .config import load_config
+from .dag import NullCache, Stage, StageCache, StageGraph
+from .paths import Paths
+from .quality import scope
+
+
+STAGES = ['ifs', 'graph', 'progress-rates', 'cost-effectiveness', 'scenario-pairs', 'jmp']
+STAGE_OUTPUTS = {
+    'ifs': ['table_ifs.csv'],
+    'graph': ['table_graph_ifs.csv', 'key_actual_commitment.csv'],
+    'progress-rates': ['table_ifs_progress_rates.csv'],
+    'cost-effectiveness': ['table_ifs_cost_effectiveness.csv', 'key_outcome.csv'],
+    'scenario-pairs': ['table_ifs_scenario_pairs.csv', 'key_scenario.csv'],
+    'jmp': ['table_jmp.csv'],
+}
+# Accepted by `only`: the stages or the output tables they write
+TARGETS = STAGES + [output for outputs in STAGE_OUTPUTS.values() for output in outputs]
+IFS_KEY_COLUMNS = ['indicator', 'unit', 'value_name', 'jmp_category', 'jmp_name', 'commitment', 'country']
+
+
+def load_keys(output_dir):
+    from .common import read_table_key
+
+    keys = {column: read_table_key(output_dir, column) for column in IFS_KEY_COLUMNS}
+    missing = [f"key_{column}.csv" for column, table in keys.items() if table is None]
+    if missing:
+        raise FileNotFoundError(
+            f"Missing key tables in {output_dir}: {', '.join(missing)}. Run a full build or include the 'ifs' stage."
+        )
+    return keys
+
+
+def select_countries(countries, config):
+    # Output country names of the selection, the IFs names of the config are accepted as well
+    from .countries import CountryIndex
+
+    selected = {config.countries.resolve(country): country for country in countries}
+    known = sorted({config.countries.resolve(country) for country in config.ifs_countries})
+    unknown = [country for resolved, country in selected.items() if resolved not in known]
+    if unknown:
+        index = CountryIndex(known)
+        names = []
+        for country in unknown:
+            matches = config.countries.close_matches(country, index)
+            names.append(f"{country} (did you mean {' or '.join(matches)}?)" if matches else country)
+        raise ValueError(f"Unknown countries: {', '.join(names)}. Known countries: {', '.join(known)}")
+    return set(selected)
+
+
+def get_country_ids(keys, countries):
+    if countries is None:
+        return None
+    return set(keys['country'][keys['country']['country'].isin(countries)]['id'])
+
+
+def save_partitions(dataframe, output_file, paths, config, country_ids):
+    if config.partitioned:
+        from .partitions import save_partitioned_table
+
+        save_partitioned_table(dataframe, paths.partition_dir(output_file), country_ids)
+
+
+def build(paths=None, config=None, only=None, countries=None, profile_memory=False, profile_slowest=False, cache=None):
+    """
+    Runs the selected stages (all of them when `only` is empty) for all the countries or only
+    `countries`, publishes the outputs and writes the run report. Returns the StageProfiler of the run.
+    `cache` is the StageCache of the memoized stage results (the one of `paths.cache_dir` by default).
+    """
+    from .profiler import StageProfiler
+    from .publish import OutputPublisher
+    from .quality import FAILED_REPORT, QualityError, QualityReport
+
+    paths = paths or Paths()
+    config = config or load_config()
+    config.countries.use_cache(paths.country_cache_file)
+    only = {get_stage_graph().stage_name(target) for target in only or ()}
+    if only - set(STAGES):
+        raise ValueError(f"Only these stages or their outputs can be selected: {', '.join(TARGETS)}")
+    stages = [stage for stage in STAGES if not only or stage in only]
+    countries = select_countries(countries, config) if countries else None
+    full_build = not only and countries is None
+    profiler = StageProfiler(paths.output_dir, trace_memory=profile_memory, profile_slowest=profile_slowest)
+
+    publisher = OutputPublisher(paths.output_dir, keep_tables=not full_build, tests_dir=paths.tests_dir)
+    with publisher as staging_dir, QualityReport(config.quality_thresholds) as quality:
+        run_stages(paths.with_output_dir(staging_dir, publisher.tests_staging_dir), config, stages, countries, full_build, profiler, cache)
+        quality.write(staging_dir)
+        try:
+            quality.check()
+        except QualityError as error:
+            # The staging directory is removed, the report of the stopped build is kept with the outputs
+            quality.write(paths.output_dir, FAILED_REPORT)
+            raise QualityError(f"{error}\nFull report: {os.path.join(paths.output_dir, FAILED_REPORT)}") from None
+        # The report of an earlier stopped build, copied with the outputs of a partial build
+        if os.path.exists(os.path.join(staging_dir, FAILED_REPORT)):
+            os.remove(os.path.join(staging_dir, FAILED_REPORT))
+    with profiler.stage("4.C Publish Outputs") as stage:
+        stage['rows'] = publisher.publish()
+    if paths.store_dir:
+        from .store import BuildStore
+
+        with profiler.stage("4.D Build Store") as stage:
+            build_id, changes = BuildStore(paths.store_dir).commit(paths.output_dir)
+            stage['rows'] = sum(sum(counts.values()) for counts in changes.values())
+            print(f"Stored build {build_id}: {stage['rows']} changed rows")
+
+    config.countries.save()
+    profiler.write_report()
+    print(profiler.summary())
+    return profiler
+
+
+def run_country_mapping(context):
+    from .countries import report_country_matches
+    from .jmp import read_jmp_file
+
+    paths, config = context['paths'], context['config']
+    with context['profiler'].stage("1.D Country Mapping") as stage:
+        data_jmp = read_jmp_file(paths.jmp_input_file)
+        report_country_matches(list(data_jmp["COUNTRY, AREA OR TERRITORY"].unique()), config.ifs_countries, config.countries)
+        stage['rows'] = len(data_jmp)
+
+
+def run_ifs_dataset(context):
+    from .ifs import build_ifs_dataset
+
+    return build_ifs_dataset(context['paths'], context['config'], context['profiler'], context['countries'], context['cache'])
+
+
+def run_ifs_keys(context):
+    from .ifs import create_ifs_keys
+
+    with context['profiler'].stage("3.C IFS Table of Keys"):
+        return create_ifs_keys(context['ifs-dataset'], context['paths'].output_dir)
+
+
+def run_keys(context):
+    # The new key tables of the ifs stages, the existing ones otherwise
+    keys = context.get('ifs-keys') or load_keys(context['paths'].output_dir)
+    context['country_ids'] = get_country_ids(keys, context['countries'])
+    return keys
+
+
+def run_ifs_table(context):
+    from .ifs import build_ifs_table
+
+    combined_df = context['ifs-dataset']
+    with context['profiler'].stage("3.D IFS Table Results", rows=len(combined_df)), scope("3.D", "table_ifs"):
+        return build_ifs_table(combined_df, context['ifs-keys'])
+
+
+def run_ifs(context):
+    from .ifs import save_ifs_table
+
+    paths, country_ids = context['paths'], context['country_ids']
+    with context['profiler'].stage("3.D.2 IFS Table") as stage, scope("3.D", "table_ifs"):
+        final_ifs = save_ifs_table(context['ifs-table'], paths, country_ids)
+        save_partitions(final_ifs.drop(columns=['2030', '2050']), paths.ifs_output_file, paths, context['config'], country_ids)
+        stage['rows'] = len(final_ifs)
+    return final_ifs
+
+
+def run_graph(context):
+    from .common import save_table
+    from .graph import build_graph_table, save_actual_commitment
+
+    paths, config, country_ids = context['paths'], context['config'], context['country_ids']
+    with context['profiler'].stage("3.D.3 IFS Graph Table") as stage, scope("3.D", "table_ifs"):
+        combined_graph = build_graph_table(context['ifs-table'], config.graph_indicator_ids(context['keys']['indicator']))
+        if config.uncertainty_draws:
+            from .uncertainty import add_uncertainty_bands
+
+            with context['profiler'].stage("3.D.4 Uncertainty Bands"):
+                combined_graph = add_uncertainty_bands(combined_graph, context['jmp-rates'], context['keys'], config)
+        save_table(combined_graph, paths.ifs_graph_output_file, 'country_id', country_ids)
+        save_partitions(combined_graph, paths.ifs_graph_output_file, paths, config, country_ids)
+        save_actual_commitment(paths.output_dir)
+        stage['rows'] = len(combined_graph)
+
+
+def run_progress_rates(context):
+    from .progress_rates import build_progress_rates
+
+    paths, config, country_ids = context['paths'], context['config'], context['country_ids']
+    with context['profiler'].stage("3.E Progress Rates") as stage, scope("3.E", "table_ifs_progress_rates"):
+        progress_rates = build_progress_rates(
+            paths, config, context['keys'], context['countries'], country_ids, context['cache'], stage
+        )
+        save_partitions(progress_rates, paths.ifs_pr_output_file, paths, config, country_ids)
+        stage['rows'] = len(progress_rates)
+
+
+def run_cost_effectiveness(context):
+    from .cost_effectiveness import build_cost_effectiveness
+
+    with context['profiler'].stage("3.F IFS Cost-Effectiveness") as stage, scope("3.F", "table_ifs_cost_effectiveness"):
+        stage['rows'] = len(build_cost_effectiveness(
+            context['paths'], context['config'], context['keys'], context.get('ifs'), context['country_ids']
+        ))
+
+
+def run_scenario_pairs(context):
+    from .scenario_pairs import build_scenario_pairs
+
+    with context['profiler'].stage("3.G IFS Scenario Pairs") as stage:
+        stage['rows'] = len(build_scenario_pairs(context['paths'], context['config'], context.get('ifs'), context['country_ids']))
+
+
+def run_jmp_data(context):
+    from .dag import file_digest
+    from .jmp import process_jmp_data, read_jmp_file
+
+    paths, config, countries = context['paths'], context['config'], context['countries']
+
+    def process_jmp_file():
+        data_jmp = read_jmp_file(paths.jmp_input_file)
+        if countries is not None:
+            jmp_countries = config.countries.map(data_jmp.iloc[:, 0])
+            data_jmp = data_jmp[jmp_countries.isin(countries)].reset_index(drop=True)
+        return process_jmp_data(data_jmp, config.countries)
+
+    with context['profiler'].stage("2.A JMP Data Processing") as stage, scope("2.A", "jmp.csv"):
+        inputs = [file_digest(paths.jmp_input_file), config.countries.config_fingerprint, countries]
+        data_melted = context['cache'].cached("2.A JMP Data Processing", inputs, process_jmp_file, stage)
+        stage['rows'] = len(data_melted)
+    return data_melted
+
+
+def run_jmp_rates(context):
+    # The rates of the whole JMP export, so the bands of a country build are the ones of a full build
+    from .dag import file_digest
+    from .jmp import process_jmp_data, read_jmp_file
+    from .quality import paused
+    from .uncertainty import jmp_rates
+
+    paths, config = context['paths'], context['config']
+    if not config.uncertainty_draws:
+        return None
+
+    def collect_rates():
+        if context['countries'] is None and 'jmp-data' in context:
+            return jmp_rates(context['jmp-data'], config.uncertainty_rate_years)
+        # The values of the export are counted by the jmp-data stage
+        with paused():
+            data_melted = process_jmp_data(read_jmp_file(paths.jmp_input_file), config.countries)
+        return jmp_rates(data_melted, config.uncertainty_rate_years)
+
+    with context['profiler'].stage("3.D.4 JMP Rates of Change") as stage:
+        inputs = [file_digest(paths.jmp_input_file), config.countries.config_fingerprint, config.uncertainty_rate_years]
+        rates = context['cache'].cached("3.D.4 JMP Rates of Change", inputs, collect_rates, stage)
+        stage['rows'] = len(rates)
+    return rates
+
+
+def run_jmp(context):
+    from .common import save_table
+    from .jmp import build_jmp_table, create_jmp_keys
+
+    paths, data_melted = context['paths'], context['jmp-data']
+    with context['profiler'].stage("2.B JMP Table Keys and Results") as stage, scope("2.B", "table_jmp"):
+        jmp_keys = create_jmp_keys(data_melted, paths.output_dir)
+        jmp_table_with_id = build_jmp_table(data_melted, context['keys'], jmp_keys)
+        save_table(jmp_table_with_id, paths.jmp_output_file, 'country_id', context['country_ids'])
+        stage['rows'] = len(jmp_table_with_id)
+
+
+def run_post(context):
+    from .post import replace_key_tables
+
+    with context['profiler'].stage("4.B Replace Key Tables"):
+        replace_key_tables(context['paths'].output_dir)
+
+
+def get_stage_graph():
+    # The STAGES and the steps they depend on, in the order they run
+    return StageGraph([
+        Stage('country-mapping', run_country_mapping),
+        Stage('ifs-dataset', run_ifs_dataset),
+        Stage('ifs-keys', run_ifs_keys, requires=['ifs-dataset']),
+        Stage('keys', run_keys, after=['ifs-keys']),
+        Stage('ifs-table', run_ifs_table, requires=['ifs-dataset', 'ifs-keys']),
+        Stage('ifs', run_ifs, requires=['ifs-table', 'keys'], outputs=STAGE_OUTPUTS['ifs']),
+        Stage('jmp-data', run_jmp_data),
+        Stage('jmp-rates', run_jmp_rates, after=['jmp-data']),
+        Stage('graph', run_graph, requires=['ifs-table', 'keys', 'jmp-rates'], outputs=STAGE_OUTPUTS['graph']),
+        Stage('progress-rates', run_progress_rates, requires=['keys'], outputs=STAGE_OUTPUTS['progress-rates']),
+        Stage('cost-effectiveness', run_cost_effectiveness, requires=['keys'], after=['ifs'], outputs=STAGE_OUTPUTS['cost-effectiveness']),
+        Stage('scenario-pairs', run_scenario_pairs, requires=['keys'], after=['ifs'], outputs=STAGE_OUTPUTS['scenario-pairs']),
+        Stage('jmp', run_jmp, requires=['jmp-data', 'keys'], outputs=STAGE_OUTPUTS['jmp']),
+        Stage('post', run_post, after=STAGES),
+    ])
+
+
+def run_stages(paths, config, stages, countries, full_build, profiler, cache=None):
+    """Runs the selected stages and the steps they depend on, `paths.output_dir` is the staging directory."""
+    if cache is None:
+        cache = StageCache(paths.stage_cache_dir) if paths.stage_cache_dir else NullCache()
+    context = {'paths': paths, 'config': config, 'countries': countries, 'profiler': profiler, 'cache': cache}
+    targets = (['country-mapping'] if full_build else []) + list(stages) + ['post']
+    return get_stage_graph().run(targets, context)
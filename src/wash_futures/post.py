@@ -0,0 +1,29 @@
+"""
+4. Post Data Transform
+
+Replaces the raw values of the key tables with the predefined strings shown in the dashboard.
+"""
+
+import os
+import pandas as pd
+
+from .common import KEY_VALUE_REPLACEMENTS
+from .publish import write_table
+
+
+# 4.A. Post Data Functions
+
+def replace_key_table_values(output_dir, table_name, new_values):
+    key_table_file_path = f"{output_dir}/key_{table_name}.csv"
+    df = pd.read_csv(key_table_file_path)
+    df = df.replace(new_values)
+    write_table(df, key_table_file_path, wait=True)
+    return df
+
+
+# 4.B. Replace Key Tables with Predefined Strings
+
+def replace_key_tables(output_dir):
+    for table_name, new_values in KEY_VALUE_REPLACEMENTS.items():
+        if os.path.exists(f"{output_dir}/key_{table_name}.csv"):
+            replace_key_table_values(output_dir, table_name, new_values)
@@ -0,0 +1,160 @@
+"""
+Stage Profiler
+
+Records every stage and step of a build (nested stages are indented in the summary): its wall time, the
+rows it produced, whether its result came from the stage cache and, with `--profile-memory`, its peak and
+net traced memory (tracemalloc). Once the outputs are published, the records are written to the output
+directory:
+
+- **run_report.json**: total run time, overall peak memory, the slowest top level stage and the stages.
+- **run_report.csv**: one row per stage.
+- **run_report_slowest.prof**: with `--profile-slowest`, the cProfile stats of the slowest top level stage
+  (readable with `pstats` or snakeviz).
+"""
+
+import os
+import io
+import csv
+import json
+import time
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class StageProfiler:
+    """
+    Collects wall time, peak traced memory and row counts for the pipeline stages.
+
+    A stage is opened with `start()` and closed with `stop()`, or wrapped with the
+    `stage()` context manager. Both return the stage record (a dict) so the caller can
+    attach a row count or any other metadata before the stage is closed.
+    """
+
+    def __init__(self, output_dir, report_name='run_report', trace_memory=False, profile_slowest=False):
+        self.output_dir = output_dir
+        self.report_name = report_name
+        self.trace_memory = trace_memory
+        self.profile_slowest = profile_slowest
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.stages = []
+        self._stack = []
+        self._slowest_profile = None
+        self._slowest_duration = -1.0
+        self._run_start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start(self, name, **meta):
+        record = {'stage': name, 'depth': len(self._stack), 'rows': None, **meta}
+        if self.trace_memory:
+            if self._stack:
+                parent = self._stack[-1]
+                parent['_peak'] = max(parent['_peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            record['_peak'] = 0
+            record['_memory_start'] = tracemalloc.get_traced_memory()[0]
+        # cProfile cannot be nested, so only top level stages are profiled
+        if self.profile_slowest and not self._stack:
+            record['_profile'] = cProfile.Profile()
+            record['_profile'].enable()
+        record['_start'] = time.perf_counter()
+        self._stack.append(record)
+        self.stages.append(record)
+        return record
+
+    def stop(self, rows=None):
+        record = self._stack.pop()
+        duration = time.perf_counter() - record.pop('_start')
+        profile = record.pop('_profile', None)
+        if profile is not None:
+            profile.disable()
+            if duration > self._slowest_duration:
+                self._slowest_duration = duration
+                self._slowest_profile = (record['stage'], profile)
+        if rows is not None:
+            record['rows'] = rows
+        record['seconds'] = round(duration, 4)
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(record.pop('_peak'), peak)
+            record['peak_memory_mb'] = round(peak / 1024 ** 2, 2)
+            record['memory_delta_mb'] = round((current - record.pop('_memory_start')) / 1024 ** 2, 2)
+            if self._stack:
+                parent = self._stack[-1]
+                parent['_peak'] = max(parent['_peak'], peak)
+        return record
+
+    @contextmanager
+    def stage(self, name, **meta):
+        record = self.start(name, **meta)
+        try:
+            yield record
+        finally:
+            self.stop()
+
+    def summary(self):
+        total = time.perf_counter() - self._run_start
+        lines = [f"{'stage':<60} {'seconds':>9} {'peak MB':>9} {'rows':>9}"]
+        for record in self.stages:
+            suffix = ' (cached)' if record.get('cached') else ''
+            name = ('  ' * record['depth'] + str(record['stage']))[:60 - len(suffix)] + suffix
+            peak = record.get('peak_memory_mb', '')
+            rows = '' if record['rows'] is None else record['rows']
+            lines.append(f"{name:<60} {record.get('seconds', ''):>9} {peak:>9} {rows:>9}")
+        lines.append(f"{'total':<60} {round(total, 4):>9}")
+        return '\n'.join(lines)
+
+    def write_report(self):
+        """
+        Writes `<report_name>.json` and `<report_name>.csv` to the output directory and,
+        when enabled, the cProfile stats of the slowest top level stage as
+        `<report_name>_slowest.prof` (readable with `pstats` or snakeviz).
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        report_path = os.path.join(self.output_dir, self.report_name)
+        report = {
+            'started_at': self.started_at,
+            'total_seconds': round(time.perf_counter() - self._run_start, 4),
+            'peak_memory_mb': None,
+            'slowest_stage': None,
+            'stages': self.stages,
+        }
+        if self.trace_memory:
+            report['peak_memory_mb'] = max([s.get('peak_memory_mb', 0) for s in self.stages], default=0)
+        if self.stages:
+            top_level = [s for s in self.stages if s['depth'] == 0] or self.stages
+            report['slowest_stage'] = max(top_level, key=lambda s: s.get('seconds', 0))['stage']
+        if self._slowest_profile is not None:
+            name, profile = self._slowest_profile
+            profile.dump_stats(f'{report_path}_slowest.prof')
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(15)
+            report['slowest_profile'] = {'stage': name, 'file': f'{self.report_name}_slowest.prof'}
+            print(stream.getvalue())
+        with open(f'{report_path}.json', 'w') as file:
+            json.dump(report, file, indent=2, default=str)
+        columns = []
+        for record in self.stages:
+            columns += [k for k in record if k not in columns]
+        with open(f'{report_path}.csv', 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(self.stages)
+        return report
+
+
+class NullProfiler:
+    """Same interface as StageProfiler without measuring anything, used when the stages run outside the pipeline."""
+
+    def start(self, name, **meta):
+        return {'stage': name, **meta}
+
+    def stop(self, rows=None):
+        return {}
+
+    @contextmanager
+    def stage(self, name, **meta):
+        yield self.start(name, **meta)
@@ -0,0 +1,114 @@
+"""
+3.E. Progress Rates
+
+Business-as-usual year in which full access (99%) is reached for the access indicators, together
+with the average yearly increase of the access level.
+"""
+
+import pandas as pd
+
+from .common import merge_id, save_table
+from .cube import IfsCube
+from .dag import NullCache, file_digest
+from .ifs import JMP_DIMENSIONS, map_jmp_id, read_ifs_file, split_value_types
+from .quality import record, scope
+
+
+progress_rates_columns=["indicator","year","country","jmp_category","value_name","value"]
+
+
+# 3.E.1 Progress Rates Functions
+
+def get_alb_value_for_progress_rates(dataframe):
+    # Basic + SafelyManaged of the same country and year for the Basic rows (an At Least Basic export has it already)
+    cube = IfsCube.from_long(dataframe).add_into('2nd_dimension', "Basic", "SafelyManaged")
+    return cube.take(cube.locate(dataframe))
+
+
+# 3.E.2 Progress Rates Collections
+
+def collect_progress_rates(ifs_input_dir, config, countries=None):
+    progress_rates_df = pd.DataFrame(columns=progress_rates_columns)
+    for ifs_file in config.ifs_files:
+        if not ifs_file.year_range:
+            continue
+        file = ifs_file.path(ifs_input_dir)
+        print(file)
+        # Only the Business-as-usual columns are read
+        df_final = read_ifs_file(
+            file, config.countries, countries=countries, scenarios={"Base"}, dimensions=JMP_DIMENSIONS.values()
+        )
+        df_final = split_value_types(df_final, ifs_file)
+        df_final = df_final[df_final['commitment'] == "Base"]
+        values = pd.to_numeric(df_final['value'], errors='coerce')
+        with scope("3.E", ifs_file.name):
+            record('coerced', values.isna() & df_final['value'].notna(), 'value')
+        df_final['value'] = get_alb_value_for_progress_rates(df_final.assign(value=values))
+        df_final = df_final[progress_rates_columns]
+        progress_rates_df = pd.concat([progress_rates_df.dropna(axis=1, how='all'), df_final], ignore_index=True)
+    return progress_rates_df
+
+
+# 3.E.3 Progress Rates Year Filters
+
+def filter_progress_rates(progress_rates_df):
+    progress_rates_df = progress_rates_df.sort_values(by=["indicator", "country", "jmp_category","value_name", "year"])
+    progress_rates_df['yearly_increase'] = progress_rates_df.groupby(["indicator", "country", "jmp_category"])['value'].diff()
+    progress_rates_df["full_services"] = progress_rates_df["value"].apply(lambda x: x > 99)
+
+    filtered_dfs = []
+
+    # Iterate over each group
+    for name, group in progress_rates_df.groupby(["indicator", "country", "jmp_category", "value_name"]):
+        group = group.sort_values(by="value")
+        group["yearly_increase"] = group["value"].diff()
+        avg_yearly_increase = group["yearly_increase"].mean()
+
+        reached_100 = group[group["value"] >= 99]
+        if not reached_100.empty:
+            filtered_group = reached_100.iloc[[0]].copy()
+            # Add the avg_yearly_increase as a new column
+            filtered_group.loc[:, "avg_yearly_increase"] = avg_yearly_increase
+            filtered_group.loc[:, "full_services"] = True
+        else:
+            filtered_group = pd.DataFrame({
+                "indicator": [name[0]],
+                "country": [name[1]],
+                "jmp_category": [name[2]],
+                "value_name": [name[3]],
+                "year": [2100],
+                "value": [group["value"].iloc[-1]],  # current value (latest in time)
+                "avg_yearly_increase": [avg_yearly_increase],
+                "full_services": False
+            })
+        filtered_dfs.append(filtered_group)
+    progress_rates_df = pd.concat(filtered_dfs, ignore_index=True)
+    return progress_rates_df[progress_rates_columns + ["avg_yearly_increase","full_services"]]
+
+
+# 3.E.4. Progress Rates Key Table Mapping
+
+def progress_rates_inputs(ifs_input_dir, config, countries=None):
+    """What the filtered progress rates depend on, the key of their memoized result."""
+    files = [ifs_file for ifs_file in config.ifs_files if ifs_file.year_range]
+    return [
+        [(file_digest(ifs_file.path(ifs_input_dir)), vars(ifs_file)) for ifs_file in files],
+        config.countries.config_fingerprint, countries,
+    ]
+
+
+def build_progress_rates(paths, config, keys, countries=None, country_ids=None, cache=None, stage=None):
+    cache = cache or NullCache()
+    progress_rates_df = cache.cached(
+        "3.E Progress Rates", progress_rates_inputs(paths.ifs_input_dir, config, countries),
+        lambda: filter_progress_rates(collect_progress_rates(paths.ifs_input_dir, config, countries)), stage,
+    )
+    progress_rates_df['jmp_name_id'] = progress_rates_df.apply(map_jmp_id, axis=1)
+    progress_rates_df = merge_id(progress_rates_df, keys['jmp_category'], 'jmp_category')
+    progress_rates_df = merge_id(progress_rates_df, keys['country'], 'country')
+    progress_rates_df = merge_id(progress_rates_df, keys['indicator'], 'indicator')
+    progress_rates_df = progress_rates_df.drop(columns=["value_name"])
+
+    # Save Progress Rates Table
+    save_table(progress_rates_df, paths.ifs_pr_output_file, 'country_id', country_ids)
+    return progress_rates_df
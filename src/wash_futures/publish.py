@@ -0,0 +1,245 @@
+"""
+4.C. Publishing the Outputs
+
+A build never writes to the output directory itself, so the dashboard doesn't see missing or half written
+tables during a build and a failed build leaves the previous outputs in place:
+
+- The tables are written to `<output_dir>.staging` (starting from a copy of the current outputs for a
+  partial build), on a thread pool while the next stages run.
+- Once every stage is done, the row count and the SHA-256 checksum of each written file are checked
+  against the ones of the table that was written.
+- The staging directory then replaces the output directory, which is kept as `<output_dir>.previous`
+  (`wash-futures rollback` swaps them back). On Linux both directories are exchanged in a single atomic
+  rename (renameat2 RENAME_EXCHANGE); elsewhere they are renamed one after the other, the output directory
+  is then missing for a moment and restored if the second rename fails.
+- The check files of the tests directory are written to `<tests_dir>.staging` as well, and moved to the
+  tests directory (one atomic rename per file) once the outputs are published.
+"""
+
+import os
+import io
+import csv
+import errno
+import ctypes
+import shutil
+import hashlib
+import ctypes.util
+from concurrent.futures import ThreadPoolExecutor
+
+
+WRITE_WORKERS = 4
+
+# Publisher of the running build, the tables saved during the build are written through it
+_publisher = None
+
+
+def staging_dir(output_dir):
+    return f"{os.path.normpath(output_dir)}.staging"
+
+
+def previous_dir(output_dir):
+    return f"{os.path.normpath(output_dir)}.previous"
+
+
+# renameat2(2)
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+def exchange_dirs(first, second):
+    """
+    Swaps two existing directories in a single atomic rename. Returns False when the system can't
+    (not Linux, or a file system without RENAME_EXCHANGE), without changing anything.
+    """
+    try:
+        renameat2 = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True).renameat2
+    except (OSError, AttributeError, TypeError):
+        return False
+    if renameat2(AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        return False
+    raise OSError(error, os.strerror(error), first, None, second)
+
+
+def replace_dir(source, target, kept):
+    """
+    Moves `source` to `target`, the existing `target` is moved to `kept` (which must not exist). `target`
+    always holds the new or the former directory: atomically swapped when the system can, otherwise
+    renamed back when the second rename fails.
+    """
+    if not os.path.exists(target):
+        os.rename(source, target)
+    elif exchange_dirs(source, target):
+        # `source` holds the former directory now
+        os.rename(source, kept)
+    else:
+        os.rename(target, kept)
+        try:
+            os.rename(source, target)
+        except BaseException:
+            os.rename(kept, target)
+            raise
+
+
+def table_content(dataframe, file):
+    """The bytes of a table saved as CSV, or as Parquet for a `.parquet` file."""
+    if file.endswith('.parquet'):
+        buffer = io.BytesIO()
+        dataframe.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    return dataframe.to_csv(index=False).encode()
+
+
+def write_table(dataframe, file, wait=False):
+    """
+    Writes a table, on the thread pool of the running build if any. `wait` returns once the file
+    is written, for the tables read again during the build (the key tables).
+    """
+    if _publisher is None:
+        with open(file, 'wb') as binary_file:
+            binary_file.write(table_content(dataframe, file))
+    else:
+        future = _publisher.write(dataframe, file)
+        if wait:
+            future.result()
+
+
+def wait_written(file):
+    """Returns once a pending write of the file is done, before reading it again."""
+    if _publisher is not None and file in _publisher.written:
+        _publisher.written[file].result()
+
+
+def count_rows(file):
+    if file.endswith('.parquet'):
+        import pyarrow.parquet
+
+        return pyarrow.parquet.ParquetFile(file).metadata.num_rows
+    with open(file, newline='') as csv_file:
+        return sum(1 for _ in csv.reader(csv_file)) - 1
+
+
+def file_checksum(file):
+    checksum = hashlib.sha256()
+    with open(file, 'rb') as binary_file:
+        for chunk in iter(lambda: binary_file.read(1 << 20), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class OutputPublisher:
+    def __init__(self, output_dir, keep_tables=False, workers=WRITE_WORKERS, tests_dir=None):
+        self.output_dir = output_dir
+        self.keep_tables = keep_tables
+        self.staging_dir = staging_dir(output_dir)
+        self.previous_dir = previous_dir(output_dir)
+        self.tests_dir = tests_dir or None
+        self.tests_staging_dir = staging_dir(tests_dir) if tests_dir else None
+        self.workers = workers
+        self.written = {}
+        self._pool = None
+
+    def __enter__(self):
+        """
+        Creates the staging directory: a copy of the output directory, without the tables (the CSV files
+        and the partitioned table directories) unless `keep_tables` is set (partial builds). The tables
+        saved in the block are written there. The tests staging directory starts with a copy of the CSV
+        check files for a partial build.
+        """
+        global _publisher
+        for directory in [self.staging_dir, self.tests_staging_dir]:
+            if directory and os.path.exists(directory):
+                shutil.rmtree(directory)
+        os.makedirs(self.staging_dir)
+        if os.path.isdir(self.output_dir):
+            for name in os.listdir(self.output_dir):
+                source = os.path.join(self.output_dir, name)
+                if os.path.isdir(source) and self.keep_tables:
+                    shutil.copytree(source, os.path.join(self.staging_dir, name))
+                elif os.path.isfile(source) and (self.keep_tables or not name.endswith('.csv')):
+                    shutil.copy2(source, self.staging_dir)
+        if self.tests_staging_dir:
+            os.makedirs(self.tests_staging_dir)
+            if self.keep_tables and os.path.isdir(self.tests_dir):
+                for name in os.listdir(self.tests_dir):
+                    source = os.path.join(self.tests_dir, name)
+                    if os.path.isfile(source) and name.endswith('.csv'):
+                        shutil.copy2(source, self.tests_staging_dir)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='publish')
+        _publisher = self
+        return self.staging_dir
+
+    def __exit__(self, exc_type, exc, traceback):
+        global _publisher
+        _publisher = None
+        self._pool.shutdown(wait=True)
+        if exc_type is not None:
+            # Nothing is published, the output and tests directories are left as they were
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+            if self.tests_staging_dir:
+                shutil.rmtree(self.tests_staging_dir, ignore_errors=True)
+        return False
+
+    def write(self, dataframe, file):
+        if file in self.written:
+            # A table written twice in the same build (e.g. the key tables of 4.B), the last write wins
+            self.written[file].result()
+        future = self._pool.submit(self._write, dataframe, file)
+        self.written[file] = future
+        return future
+
+    @staticmethod
+    def _write(dataframe, file):
+        content = table_content(dataframe, file)
+        with open(file, 'wb') as binary_file:
+            binary_file.write(content)
+        return len(dataframe), hashlib.sha256(content).hexdigest()
+
+    def verify(self):
+        """Checks the written files against their tables, raises a RuntimeError listing the mismatches."""
+        errors = []
+        for file, future in self.written.items():
+            rows, checksum = future.result()
+            if not os.path.exists(file):
+                errors.append(f"{file}: missing")
+            elif file_checksum(file) != checksum:
+                errors.append(f"{file}: checksum mismatch")
+            elif count_rows(file) != rows:
+                errors.append(f"{file}: {count_rows(file)} rows instead of {rows}")
+        if errors:
+            raise RuntimeError(f"Outputs not published, {self.staging_dir} is kept for inspection:\n" + "\n".join(errors))
+        return sum(rows for rows, _ in (future.result() for future in self.written.values()))
+
+    def publish(self):
+        """
+        Verifies the written files and swaps the staging directory in, the current output directory
+        becomes the previous one. Returns the number of rows written.
+        """
+        rows = self.verify()
+        if os.path.exists(self.previous_dir):
+            shutil.rmtree(self.previous_dir)
+        replace_dir(self.staging_dir, self.output_dir, self.previous_dir)
+        if self.tests_staging_dir:
+            os.makedirs(self.tests_dir, exist_ok=True)
+            for file in self.written:
+                if os.path.dirname(file) == self.tests_staging_dir:
+                    os.replace(file, os.path.join(self.tests_dir, os.path.basename(file)))
+            shutil.rmtree(self.tests_staging_dir)
+        print(f"Published {len(self.written)} files to {self.output_dir}")
+        return rows
+
+
+def rollback(output_dir):
+    """Swaps the output directory with the previous one, a second rollback restores it."""
+    previous = previous_dir(output_dir)
+    if not os.path.isdir(previous):
+        raise FileNotFoundError(f"No previous outputs to roll back to: {previous}")
+    if not exchange_dirs(previous, output_dir):
+        swap = staging_dir(output_dir)
+        if os.path.exists(swap):
+            shutil.rmtree(swap)
+        replace_dir(previous, output_dir, swap)
+        os.rename(swap, previous)
+    print(f"Rolled back {output_dir}, the replaced outputs are in {previous}")
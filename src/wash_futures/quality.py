@@ -0,0 +1,138 @@
+"""
+Data Quality Report
+
+Counts the values that the stages change or drop on their own, per stage, source file (or table) and
+column, so they don't go unnoticed:
+
+- **coerced**: IFS values that are not numbers, turned into missing values.
+- **zero_filled**: missing IFS values replaced with 0.
+- **unmatched_id**: values without a row in their key table, mapped to the id 0 (`merge_id`).
+- **dropped**: rows removed by a cleanup (JMP category or commitment year not matching, unknown JMP country).
+- **sentinel_nan**: JMP `-99` values turned into missing values.
+
+The counts are taken on the masks the stages already compute, so recording them costs next to nothing.
+`quality_report.csv` is written next to the outputs, and the `[quality]` thresholds of the config (largest
+share of rows per stage, source, column and check) stop the build before the outputs are published, with a
+QualityError. The report of a stopped build is kept as `quality_report.failed.csv` in the output directory.
+"""
+
+import os
+from contextlib import contextmanager
+
+
+CHECKS = ['coerced', 'zero_filled', 'unmatched_id', 'dropped', 'sentinel_nan']
+FAILED_REPORT = 'quality_report.failed.csv'
+
+# Report of the running build and the stage and source of the counts being recorded
+_report = None
+_scope = ('', '')
+# Counts collected for the memoized stage results being computed (dag.StageCache)
+_captures = []
+
+
+@contextmanager
+def scope(stage, source=''):
+    global _scope
+    previous, _scope = _scope, (stage, source)
+    try:
+        yield
+    finally:
+        _scope = previous
+
+
+def record(check, mask, column=''):
+    """Counts the True values of a boolean mask (Series or array) for a check of the current scope."""
+    counts = (*_scope, column, check, int(mask.sum()), len(mask))
+    for records in _captures:
+        records.append(counts)
+    if _report is not None:
+        _report.add(*counts)
+
+
+@contextmanager
+def capture():
+    """Collects the counts recorded in the block, so a memoized result can replay them when it is reused."""
+    records = []
+    _captures.append(records)
+    try:
+        yield records
+    finally:
+        _captures.remove(records)
+
+
+@contextmanager
+def paused():
+    """Records nothing in the block, for the inputs a stage reads again after the stage counting them."""
+    global _report, _captures
+    previous = _report, _captures
+    _report, _captures = None, []
+    try:
+        yield
+    finally:
+        _report, _captures = previous
+
+
+def replay(records):
+    if _report is not None:
+        for counts in records:
+            _report.add(*counts)
+
+
+class QualityError(RuntimeError):
+    """Counts above their threshold, the outputs are not published."""
+
+
+class QualityReport:
+    def __init__(self, thresholds=None):
+        self.thresholds = dict(thresholds or {})
+        unknown = set(self.thresholds) - set(CHECKS)
+        if unknown:
+            raise ValueError(f"Unknown quality checks: {', '.join(sorted(unknown))}. Checks: {', '.join(CHECKS)}")
+        self.counts = {}
+
+    def __enter__(self):
+        global _report
+        _report = self
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        global _report
+        _report = None
+        return False
+
+    def add(self, stage, source, column, check, count, total):
+        counts = self.counts.setdefault((stage, source, column, check), [0, 0])
+        counts[0] += count
+        counts[1] += total
+
+    def to_frame(self):
+        # Imported here, the pipeline and the CLI import this module without loading pandas
+        import pandas as pd
+
+        report = pd.DataFrame(
+            [(*key, count, total) for key, (count, total) in self.counts.items()],
+            columns=['stage', 'source', 'column', 'check', 'count', 'total'],
+        )
+        report['share'] = (report['count'] / report['total'].where(report['total'] > 0)).fillna(0).round(6)
+        return report
+
+    def violations(self):
+        report = self.to_frame()
+        limits = report['check'].map(self.thresholds)
+        return report[limits.notna() & (report['share'] > limits)]
+
+    def write(self, output_dir, name='quality_report.csv'):
+        report = self.to_frame()
+        os.makedirs(output_dir, exist_ok=True)
+        report.to_csv(os.path.join(output_dir, name), index=False)
+        return report
+
+    def check(self):
+        """Raises a QualityError listing the counts above their threshold."""
+        violations = self.violations()
+        if len(violations):
+            lines = [
+                f"{row.stage} {row.source} {row.column}: {row.count} {row.check} of {row.total} ({row.share:.2%} > {self.thresholds[row.check]:.2%})"
+                for row in violations.itertuples()
+            ]
+            raise QualityError("Data quality thresholds exceeded, outputs not published:\n" + "\n".join(lines))
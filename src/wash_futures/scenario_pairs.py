@@ -0,0 +1,107 @@
+"""
+3.G. IFS Scenario Pairs Table
+
+Differences between every pair of scenarios (value name, JMP category and commitment, Business-as-usual
+included) per indicator, country and year, so comparing two commitments (e.g. Doubling and Quadrupling)
+is a lookup of `table_ifs_scenario_pairs.csv` on `scenario_id` and `other_scenario_id` instead of
+filtering `table_ifs.csv` twice:
+
+- **key_scenario.csv**: the scenarios with the ids of their value name, JMP category and commitment.
+- **delta**: value of `scenario_id` minus the value of `other_scenario_id`, with `scenario_id < other_scenario_id`
+  (the delta of the reversed pair is the opposite).
+
+The table is sparse: the pairs with equal or missing values, or with an absolute delta below
+`scenario_pairs.min_abs_delta`, are left out, and `scenario_pairs.top_k` keeps only the largest
+absolute deltas of each indicator, country and year.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .common import save_table
+from .cube import IfsCube
+from .publish import write_table
+
+
+scenario_key_columns = ['value_name_id', 'jmp_category_id', 'commitment_id']
+
+scenario_pairs_columns = [
+    'year', 'country_id', 'indicator_id', 'scenario_id', 'other_scenario_id', 'value', 'other_value', 'delta'
+]
+
+PAIR_AXES = ('indicator_id', 'country_id', 'year', 'scenario_id')
+
+
+def create_scenario_keys(final_ifs, output_dir):
+    """
+    Key table of the scenarios of `final_ifs`. As for the other key tables, the existing ids are kept
+    and the new scenarios are numbered after them.
+    """
+    file_path = f'{output_dir}/key_scenario.csv'
+    new_table = final_ifs[scenario_key_columns].drop_duplicates().sort_values(scenario_key_columns)
+    try:
+        existing_table = pd.read_csv(file_path)
+    except FileNotFoundError:
+        existing_table = pd.DataFrame(columns=['id'] + scenario_key_columns, dtype=int)
+    new_values = new_table.merge(existing_table, on=scenario_key_columns, how='left', indicator=True)
+    new_values = new_values[new_values['_merge'] == 'left_only'][scenario_key_columns]
+    max_id = existing_table['id'].max() if len(existing_table) else 0
+    new_values.insert(0, 'id', range(max_id + 1, max_id + 1 + len(new_values)))
+    updated_table = pd.concat([existing_table, new_values], ignore_index=True).astype(int)
+    write_table(updated_table, file_path, wait=True)
+    return updated_table
+
+
+def build_scenario_pairs_table(final_ifs, scenario_keys, years=None, top_k=0, min_abs_delta=0.0):
+    """
+    One row per pair of scenarios of each indicator, country and year. The scenario values are
+    laid out as a cube with the scenarios on the last axis and every pair is computed at once.
+    """
+    if years:
+        final_ifs = final_ifs[final_ifs['year'].isin(years)]
+    rows = final_ifs.merge(scenario_keys.rename(columns={'id': 'scenario_id'}), on=scenario_key_columns)
+    # Scenarios in id order, so the pairs are (lower id, higher id)
+    rows = rows.sort_values(by='scenario_id', kind='stable')
+    cube = IfsCube.from_long(rows, axes=PAIR_AXES)
+    scenarios = cube.axes['scenario_id'].to_numpy()
+    values = cube.values.reshape(-1, len(scenarios))
+
+    first, second = np.triu_indices(len(scenarios), k=1)
+    delta = values[:, first] - values[:, second]
+    magnitude = np.abs(delta)
+    keep = magnitude > min_abs_delta
+    if top_k and top_k < len(first):
+        # The k largest absolute deltas of each cell, the missing ones last
+        ranked = np.argpartition(np.where(keep, -magnitude, np.inf), top_k - 1, axis=1)[:, :top_k]
+        top = np.zeros_like(keep)
+        np.put_along_axis(top, ranked, True, axis=1)
+        keep &= top
+
+    cells, pairs = np.nonzero(keep)
+    indicator, country, year = np.unravel_index(cells, cube.values.shape[:-1])
+    table = pd.DataFrame({
+        'year': cube.axes['year'][year],
+        'country_id': cube.axes['country_id'][country],
+        'indicator_id': cube.axes['indicator_id'][indicator],
+        'scenario_id': scenarios[first[pairs]],
+        'other_scenario_id': scenarios[second[pairs]],
+        'value': values[cells, first[pairs]],
+        'other_value': values[cells, second[pairs]],
+        'delta': delta[cells, pairs],
+    })
+    return table[scenario_pairs_columns].sort_values(by=['year', 'country_id', 'indicator_id'], kind='stable').reset_index(drop=True)
+
+
+def build_scenario_pairs(paths, config, final_ifs=None, country_ids=None):
+    from .cost_effectiveness import load_ifs_table
+
+    if final_ifs is None:
+        final_ifs = load_ifs_table(paths.ifs_output_file)
+    if country_ids is not None:
+        final_ifs = final_ifs[final_ifs['country_id'].isin(country_ids)]
+    scenario_keys = create_scenario_keys(final_ifs, paths.output_dir)
+    table = build_scenario_pairs_table(
+        final_ifs, scenario_keys, config.pair_years, config.pair_top_k, config.pair_min_abs_delta
+    )
+    save_table(table, paths.ifs_pairs_output_file, 'country_id', country_ids)
+    return table
@@ -0,0 +1,160 @@
+"""
+4.D. Build Store
+
+History of the published outputs (`--store-dir`), so the changes between two IFs releases don't need
+hand-copied snapshots and the downstream loaders can upsert the changes instead of reloading everything:
+
+- **objects/**: the tables split per country (`country_id`), each part sorted on its dimension columns and
+  stored gzipped under the SHA-256 of its CSV content. A part that didn't change between two builds is
+  stored once, so a country rebuild only adds the parts of that country.
+- **builds/<build>.json**: the manifest of a build, with the dimension columns and the parts of each table.
+  `latest` holds the last build.
+- **deltas/<build>/<table>.csv**: the rows inserted, updated and deleted since the previous build (`change`
+  column), with the new values (the old ones for the deleted rows). The first build inserts every row.
+"""
+
+import os
+import glob
+import gzip
+import json
+import hashlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .compare import infer_columns
+
+
+PARTITION_COLUMN = 'country_id'
+CHANGE_TYPES = ['inserted', 'updated', 'deleted']
+
+
+class BuildStore:
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.objects_dir = os.path.join(store_dir, 'objects')
+        self.builds_dir = os.path.join(store_dir, 'builds')
+        self.deltas_dir = os.path.join(store_dir, 'deltas')
+
+    def latest(self):
+        """Id of the last build, None for an empty store."""
+        latest_file = os.path.join(self.store_dir, 'latest')
+        if not os.path.exists(latest_file):
+            return None
+        with open(latest_file) as file:
+            return file.read().strip()
+
+    def manifest(self, build):
+        with open(os.path.join(self.builds_dir, f'{build}.json')) as file:
+            return json.load(file)
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f'{digest}.csv.gz')
+
+    def write_object(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f'{path}.tmp', 'wb') as file:
+                file.write(gzip.compress(content, mtime=0))
+            os.replace(f'{path}.tmp', path)
+        return digest
+
+    def read_object(self, digest):
+        with gzip.open(self.object_path(digest)) as file:
+            return pd.read_csv(file, float_precision='round_trip')
+
+    def load_table(self, build, table):
+        """A table of a stored build, its rows sorted per country and dimension columns."""
+        parts = self.manifest(build)['tables'][table]['parts']
+        return pd.concat([self.read_object(digest) for digest in parts.values()], ignore_index=True)
+
+    def commit(self, output_dir):
+        """
+        Stores the `table_*` and `key_*` files of a published output directory as a new build and writes
+        its deltas. Returns the new build id and the number of changed rows per table and change type.
+        """
+        parent = self.latest()
+        previous = self.manifest(parent)['tables'] if parent else {}
+        tables, deltas, changes = {}, {}, {}
+        for file in sorted(glob.glob(os.path.join(output_dir, '*.csv'))):
+            name = os.path.splitext(os.path.basename(file))[0]
+            if not name.startswith(('table_', 'key_')):
+                continue
+            dataframe = pd.read_csv(file, float_precision='round_trip')
+            keys = dimension_columns(dataframe, name)
+            tables[name] = {'keys': keys, 'rows': len(dataframe), 'parts': self.write_parts(dataframe, keys)}
+            deltas[name] = self.table_delta(previous.get(name), tables[name], keys)
+            changes[name] = deltas[name]['change'].value_counts().reindex(CHANGE_TYPES, fill_value=0).to_dict()
+
+        content = json.dumps(tables, sort_keys=True).encode()
+        build = f"{datetime.now():%Y%m%d-%H%M%S}-{hashlib.sha256(content).hexdigest()[:8]}"
+        delta_dir = os.path.join(self.deltas_dir, build)
+        os.makedirs(delta_dir, exist_ok=True)
+        for name, delta in deltas.items():
+            delta.to_csv(os.path.join(delta_dir, f'{name}.csv'), index=False)
+        os.makedirs(self.builds_dir, exist_ok=True)
+        manifest = {'build': build, 'parent': parent, 'created_at': datetime.now().isoformat(timespec='seconds'),
+                    'tables': tables, 'changes': changes}
+        with open(os.path.join(self.builds_dir, f'{build}.json'), 'w') as file:
+            json.dump(manifest, file, indent=2)
+        # The build is only visible once its objects, deltas and manifest are written
+        with open(os.path.join(self.store_dir, 'latest.tmp'), 'w') as file:
+            file.write(build)
+        os.replace(os.path.join(self.store_dir, 'latest.tmp'), os.path.join(self.store_dir, 'latest'))
+        return build, changes
+
+    def write_parts(self, dataframe, keys):
+        dataframe = dataframe.sort_values(by=keys, kind='stable')
+        if PARTITION_COLUMN in dataframe.columns:
+            groups = dataframe.groupby(PARTITION_COLUMN, sort=True)
+        else:
+            groups = [('all', dataframe)]
+        return {str(part): self.write_object(rows.to_csv(index=False).encode()) for part, rows in groups}
+
+    def table_delta(self, old_table, new_table, keys):
+        """Rows changed between two stored versions of a table, only the parts with another digest are read."""
+        old_parts = old_table['parts'] if old_table and old_table['keys'] == keys else {}
+        new_parts = new_table['parts']
+        changed = [part for part in sorted(set(old_parts) | set(new_parts)) if old_parts.get(part) != new_parts.get(part)]
+        old = [self.read_object(old_parts[part]) for part in changed if part in old_parts]
+        new = [self.read_object(new_parts[part]) for part in changed if part in new_parts]
+        return row_delta(pd.concat(old, ignore_index=True) if old else None,
+                         pd.concat(new, ignore_index=True) if new else None, keys)
+
+
+def dimension_columns(dataframe, name):
+    keys, _ = infer_columns(dataframe, ['id'] if name.startswith('key_') else None)
+    if dataframe.duplicated(keys).any():
+        raise ValueError(f"{name}: the dimension columns {keys} don't identify the rows")
+    return keys
+
+
+def row_delta(old, new, keys):
+    """Inserted, updated and deleted rows of `new` against `old`, matched on the `keys` columns."""
+    if old is None and new is None:
+        return pd.DataFrame(columns=['change'] + keys)
+    if old is None:
+        return new.assign(change='inserted')[['change'] + list(new.columns)]
+    if new is None:
+        return old.assign(change='deleted')[['change'] + list(old.columns)]
+    merged = old.merge(new, on=keys, how='outer', suffixes=('_old', ''), indicator=True)
+    values = [column for column in new.columns if column not in keys]
+    updated = np.zeros(len(merged), dtype=bool)
+    for column in values:
+        old_values = merged[f'{column}_old'] if f'{column}_old' in merged else pd.Series(np.nan, index=merged.index)
+        # Missing values on both sides are equal
+        updated |= ~((merged[column] == old_values) | (merged[column].isna() & old_values.isna())).to_numpy()
+    merged['change'] = np.select(
+        [merged['_merge'] == 'right_only', merged['_merge'] == 'left_only', updated],
+        ['inserted', 'deleted', 'updated'], default=''
+    )
+    deleted = merged['_merge'] == 'left_only'
+    for column in values:
+        if f'{column}_old' in merged:
+            merged.loc[deleted, column] = merged.loc[deleted, f'{column}_old']
+    delta = merged[merged['change'] != ''][['change'] + list(new.columns)]
+    # The missing side of the outer merge turned the integer columns into floats
+    return delta.astype(new.dtypes.to_dict()).reset_index(drop=True)
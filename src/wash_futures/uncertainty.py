@@ -0,0 +1,124 @@
+"""
+3.D.4. Uncertainty Bands
+
+p10, p50 and p90 of the access values of `table_graph_ifs.csv` (`value_p10`, `value_p50`, `value_p90`)
+over Monte-Carlo draws of the IFs trajectories, so the dashboard can show how robust a gap is:
+
+- **Business-as-usual**: the yearly change of the trajectory is off by up to ± `rate_error` times the
+  JMP annual rate of change of the country, service and category (mean absolute rate of the last
+  `rate_years` years of the whole JMP export), i.e. `base + drift * (year - first year)` with a uniform drift per draw.
+- **Scenarios**: their difference with the Business-as-usual trajectory is multiplied by a uniform draw
+  between 1 - `multiplier_error` and 1 + `multiplier_error`, on top of the Business-as-usual drift.
+
+The values are kept between 0 and 100 (percent of population). All the draws of an indicator and country
+are computed as one NumPy array (draws x scenarios x years), and the random generator of each indicator and
+country is seeded with `seed` and their ids, so a country build gives the same bands as a full build.
+"""
+
+import numpy as np
+
+
+PERCENTILES = [10, 50, 90]
+band_columns = [f'value_p{percentile}' for percentile in PERCENTILES]
+
+band_key_columns = ['indicator_id', 'country_id', 'jmp_category_id', 'value_name_id', 'actual_commitment_id']
+
+
+def get_service(indicator):
+    # JMP service (`jmp_name` of the JMP export) of an IFS access indicator
+    for service in ['Water', 'Sanitation']:
+        if service in indicator:
+            return service
+    return None
+
+
+def jmp_rates(data_melted, rate_years=5):
+    """
+    Mean absolute JMP annual rate of change of the last `rate_years` years, per country, service (jmp_name)
+    and JMP category. Taken on the whole JMP export, so the bands don't depend on the countries of a build.
+    """
+    rates = data_melted[(data_melted['value_type'] == 'annual_rate_change') & data_melted['value'].notna()]
+    rates = rates[rates['year'] > rates['year'].max() - rate_years]
+    rates = rates.assign(rate=rates['value'].astype(float).abs())
+    return rates.groupby(['country', 'jmp_name', 'jmp_category'], as_index=False)['rate'].mean()
+
+
+def jmp_rate_bounds(rates, keys):
+    """The JMP rates with the country and JMP category ids of the keys."""
+    # Mapped without merge_id, the JMP countries missing from the IFS keys are counted by the jmp stage
+    rates = rates.assign(
+        country_id=rates['country'].map(dict(zip(keys['country']['country'], keys['country']['id']))),
+        jmp_category_id=rates['jmp_category'].map(dict(zip(keys['jmp_category']['jmp_category'], keys['jmp_category']['id']))),
+    ).dropna(subset=['country_id', 'jmp_category_id'])
+    return rates[['country_id', 'jmp_name', 'jmp_category_id', 'rate']]
+
+
+def draw_bands(values, base_rows, categories, offsets, bounds, rng, draws, multiplier_error):
+    """
+    Percentiles (PERCENTILES x rows x years) of the draws of one indicator and country: `values` are the
+    trajectories (rows x years), `base_rows` the row of their Business-as-usual trajectory, `categories`
+    the index of their JMP category in `bounds` (largest yearly drift per category) and `offsets` the
+    years since the first one.
+    """
+    base = values[base_rows]
+    drift = rng.uniform(-1, 1, size=(draws, len(bounds), 1)) * bounds[None, :, None]
+    multiplier = rng.uniform(1 - multiplier_error, 1 + multiplier_error, size=(draws, len(values), 1))
+    trajectories = base[None] + drift[:, categories] * offsets[None, None, :] + multiplier * (values - base)[None]
+    return np.percentile(np.clip(trajectories, 0, 100), PERCENTILES, axis=0)
+
+
+def build_uncertainty_bands(combined_graph, rate_bounds, indicator_keys, base_commitment_id,
+                            draws=1000, seed=0, rate_error=0.5, multiplier_error=0.2):
+    """One row per trajectory value of the graph table (keys and `actual_year`) with its bands."""
+    values = combined_graph.drop_duplicates(band_key_columns + ['actual_year']).set_index(
+        band_key_columns + ['actual_year']
+    )['value'].unstack('actual_year')
+    years = values.columns.to_numpy()
+    offsets = (years - years.min()).astype(float)
+    services = dict(zip(indicator_keys['id'], indicator_keys['indicator'].map(get_service)))
+    bounds_by_cell = rate_bounds.set_index(['country_id', 'jmp_name', 'jmp_category_id'])['rate'] * rate_error
+    # Countries without JMP rates take the median bound of their service and category
+    default_bounds = bounds_by_cell.groupby(level=['jmp_name', 'jmp_category_id']).median()
+
+    index = values.index.to_frame(index=False)
+    matrix = values.to_numpy(dtype=float)
+    bands = np.full((len(PERCENTILES),) + matrix.shape, np.nan)
+    for (indicator_id, country_id), rows in index.groupby(['indicator_id', 'country_id']).indices.items():
+        group = index.iloc[rows]
+        category_ids, categories = np.unique(group['jmp_category_id'].to_numpy(), return_inverse=True)
+        # Row of the Business-as-usual trajectory of each category, -1 for a category without one (no band)
+        base_of_category = np.full(len(category_ids), -1)
+        for row in np.flatnonzero((group['actual_commitment_id'] == base_commitment_id).to_numpy())[::-1]:
+            base_of_category[categories[row]] = row
+        base_rows = base_of_category[categories]
+        if (base_rows < 0).all():
+            continue
+        service = services.get(indicator_id)
+        bounds = np.array([
+            bounds_by_cell.get((country_id, service, category), default_bounds.get((service, category), 0.0))
+            for category in category_ids
+        ])
+        rng = np.random.default_rng([seed, int(indicator_id), int(country_id)])
+        group_bands = draw_bands(
+            matrix[rows], np.maximum(base_rows, 0), categories, offsets, bounds, rng, draws, multiplier_error
+        )
+        group_bands[:, base_rows < 0] = np.nan
+        bands[:, rows] = group_bands
+
+    result = index.loc[index.index.repeat(len(years))].reset_index(drop=True)
+    result['actual_year'] = np.tile(years, len(index))
+    for column, band in zip(band_columns, bands):
+        result[column] = band.reshape(-1).round(4)
+    return result
+
+
+def add_uncertainty_bands(combined_graph, rates, keys, config):
+    """`combined_graph` with the band columns, for the cells with a value. `rates` are the `jmp_rates`."""
+    commitments = keys['commitment']
+    base_commitment_id = commitments.loc[commitments['commitment'] == 'Base', 'id'].iloc[0]
+    bands = build_uncertainty_bands(
+        combined_graph, jmp_rate_bounds(rates, keys), keys['indicator'],
+        base_commitment_id, config.uncertainty_draws, config.uncertainty_seed, config.uncertainty_rate_error,
+        config.uncertainty_multiplier_error,
+    )
+    return combined_graph.merge(bands, on=band_key_columns + ['actual_year'], how='left')
@@ -0,0 +1,174 @@
+"""
+Watch Mode
+
+Rebuilds the outputs when the IFs or JMP inputs change (`wash-futures watch`):
+
+- **Change events**: inotify on Linux, polling of the modification times and sizes of the input files
+  otherwise (or with `poll_interval` forced).
+- **Debounce**: a rebuild starts once no input changed for `debounce` seconds, so copying a batch of
+  exports triggers a single rebuild.
+- **affected_stages**: only the stages of the changed files run (a graph indicator file rebuilds the
+  graph table, a year range file the progress rates, the JMP export the JMP table...).
+- **Warm state**: the parsed IFs files and the other memoized results are kept in memory between the
+  rebuilds (StageCache), so the unchanged files are neither parsed nor loaded from disk again.
+
+Every rebuild prints its stage timings, and a line with the changed files, the stages and the duration.
+"""
+
+import os
+import time
+import ctypes
+import select
+import ctypes.util
+from datetime import datetime
+
+from .dag import StageCache
+from .inputs import input_name
+from .pipeline import STAGES, build
+
+
+DEBOUNCE = 2.0
+POLL_INTERVAL = 1.0
+
+# inotify(7) events of the files created, written, moved or deleted in a directory
+IN_CLOEXEC = 0o2000000
+IN_EVENTS = 0x00000008 | 0x00000040 | 0x00000080 | 0x00000100 | 0x00000200
+
+
+def snapshot(directories):
+    """Modification time and size of the files of the directories."""
+    files = {}
+    for directory in directories:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def changed_files(before, after):
+    return sorted(path for path in before.keys() | after.keys() if before.get(path) != after.get(path))
+
+
+class InotifyEvents:
+    """Waits for the changes of the directories with inotify, through the C library."""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for directory in directories:
+            if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_EVENTS) < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout=None):
+        """True when something changed within `timeout` seconds (forever when None)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            os.read(self.fd, 1 << 16)
+        return bool(ready)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingEvents:
+    """Same interface as InotifyEvents, comparing snapshots of the directories every `interval` seconds."""
+
+    def __init__(self, directories, interval=POLL_INTERVAL):
+        self.directories = directories
+        self.interval = interval
+        self.files = snapshot(directories)
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            files = snapshot(self.directories)
+            if files != self.files:
+                self.files = files
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline - time.monotonic())))
+
+    def close(self):
+        pass
+
+
+def open_events(directories, poll_interval=None):
+    if poll_interval is None:
+        try:
+            return InotifyEvents(directories)
+        except (OSError, AttributeError, TypeError):
+            # No inotify (not Linux, or no watches left)
+            pass
+    return PollingEvents(directories, poll_interval or POLL_INTERVAL)
+
+
+def affected_stages(changed, paths, config):
+    """The stages to rebuild for the changed input files, in the order of STAGES."""
+    # The files are matched on their .csv name, so a compressed export counts as well
+    ifs_files = [
+        config.files_by_name[input_name(file)] for file in changed
+        if os.path.dirname(file) == os.path.normpath(paths.ifs_input_dir) and input_name(file) in config.files_by_name
+    ]
+    stages = set()
+    if ifs_files:
+        stages |= {'ifs', 'scenario-pairs'}
+    if any(ifs_file.graph for ifs_file in ifs_files):
+        stages.add('graph')
+    if any(ifs_file.year_range for ifs_file in ifs_files):
+        stages.add('progress-rates')
+    if any(ifs_file.expenditure or ifs_file.outcome for ifs_file in ifs_files):
+        stages.add('cost-effectiveness')
+    jmp_dir = os.path.normpath(os.path.dirname(paths.jmp_input_file))
+    if any(os.path.dirname(file) == jmp_dir and input_name(file) == input_name(paths.jmp_input_file) for file in changed):
+        stages.add('jmp')
+        # The uncertainty bands of the graph table depend on the JMP rates of change
+        if config.uncertainty_draws:
+            stages.add('graph')
+    return [stage for stage in STAGES if stage in stages]
+
+
+def rebuild(paths, config, cache, only=None, changed=()):
+    start = time.perf_counter()
+    try:
+        build(paths, config, only=only, cache=cache)
+        status = "rebuilt"
+    except Exception as error:
+        # The outputs of the previous build stay published, the next change triggers a new rebuild
+        print(f"Build failed: {error}")
+        status = "failed"
+    names = ', '.join(os.path.basename(file) for file in changed) or 'all inputs'
+    print(
+        f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {status} {', '.join(only or ['all stages'])} "
+        f"in {time.perf_counter() - start:.2f}s ({names})"
+    )
+
+
+def watch(paths, config, debounce=DEBOUNCE, poll_interval=None, initial_build=True):
+    """Builds the outputs, then rebuilds the affected stages after every change of the inputs until interrupted."""
+    directories = [os.path.normpath(paths.ifs_input_dir), os.path.normpath(os.path.dirname(paths.jmp_input_file))]
+    cache = StageCache(paths.stage_cache_dir, keep_in_memory=True)
+    events = open_events(directories, poll_interval)
+    files = snapshot(directories)
+    print(f"Watching {', '.join(directories)} ({type(events).__name__})")
+    try:
+        if initial_build:
+            rebuild(paths, config, cache)
+        while True:
+            events.wait()
+            while events.wait(debounce):
+                pass
+            current = snapshot(directories)
+            changed, files = changed_files(files, current), current
+            stages = affected_stages(changed, paths, config)
+            if stages:
+                rebuild(paths, config, cache, stages, changed)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        events.close()